@@ -1,8 +1,9 @@
 import streamlit as st
+import pandas as pd
 from rag.rag_system import RAGSystem
 from rag.PromptGenerator import PROMPTING_METHODS
+from rag.evaluation import EvaluationRunner
 import time
-import re
 
 # Page configuration
 st.set_page_config(
@@ -102,7 +103,9 @@ st.markdown("""
 # Initialize RAG system (cache to avoid reloading on every rerun)
 @st.cache_resource
 def get_rag_system():
-    return RAGSystem()
+    rag_system = RAGSystem()
+    rag_system.warm_up()
+    return rag_system
 
 # Initialize session state
 if "question" not in st.session_state:
@@ -132,46 +135,6 @@ SAMPLE_QUERIES = [
     "What are the main challenges and future trends in quantum computing?"
 ]
 
-# Evaluation set (from evaluate.py)
-EVAL_SET = [
-    {
-        'question': "What is quantum computing and how does it differ from classical computing?",
-        'reference': "Quantum computing uses qubits that can exist in multiple states simultaneously, leveraging superposition and entanglement, unlike classical computers that use bits (0 or 1). This allows quantum computers to solve certain problems much faster than classical computers."
-    },
-    {
-        'question': "What are qubits, superposition, and entanglement in quantum computing?",
-        'reference': "Qubits are quantum bits that can represent both 0 and 1 at the same time (superposition). Entanglement is a property where qubits become linked and the state of one affects the other, enabling powerful quantum computations."
-    },
-    {
-        'question': "How could quantum computing impact cryptography and data security?",
-        'reference': "Quantum computers can break current encryption methods like RSA by factoring large numbers efficiently, which threatens data security. This drives research into quantum-resistant cryptography."
-    },
-    {
-        'question': "What are some real-world applications of quantum computing?",
-        'reference': "Quantum computing can be used in cryptography, optimization, drug discovery, materials science, and complex simulations that are difficult for classical computers."
-    },
-    {
-        'question': "What are the main challenges and future trends in quantum computing?",
-        'reference': "Challenges include scalability, error correction, and stability of qubits. Future trends involve overcoming these barriers, developing quantum-safe cryptography, and expanding applications in various fields."
-    }
-]
-
-TOKENIZER = re.compile(r'\w+')
-def tokenize(text):
-    return TOKENIZER.findall(text.lower())
-
-def compute_f1(prediction, reference):
-    pred_tokens = tokenize(prediction)
-    ref_tokens = tokenize(reference)
-    common = set(pred_tokens) & set(ref_tokens)
-    if not common:
-        return 0.0
-    precision = len(common) / len(pred_tokens) if pred_tokens else 0
-    recall = len(common) / len(ref_tokens) if ref_tokens else 0
-    if precision + recall == 0:
-        return 0.0
-    return 2 * (precision * recall) / (precision + recall)
-
 # Main header
 st.markdown("""
 <div class="main-header">
@@ -261,7 +224,7 @@ with col1:
     st.session_state["question"] = question
     
     # Query button with enhanced styling
-    col_query, col_analyze = st.columns([1, 1])
+    col_query, col_compare, col_analyze = st.columns([1, 1, 1])
     
     with col_query:
         query_button = st.button(
@@ -270,6 +233,12 @@ with col1:
             use_container_width=True
         )
     
+    with col_compare:
+        compare_button = st.button(
+            "⚖️ Compare All Methods",
+            use_container_width=True
+        )
+    
     with col_analyze:
         analyze_button = st.button(
             "📊 Analyze Methods",
@@ -310,6 +279,18 @@ with col2:
                     <p>Chunks</p>
                 </div>
                 """, unsafe_allow_html=True)
+
+            answer_cache = stats.get('answer_cache', {})
+            embedding_cache = stats.get('embedding_cache', {})
+            st.caption(
+                f"Answer cache hit rate: {answer_cache.get('hit_rate', 0):.0%} · "
+                f"Embedding cache hits: {embedding_cache.get('hits', 0)} / misses: {embedding_cache.get('misses', 0)} · "
+                f"Coalesced requests: {stats.get('coalescing', {}).get('coalesced', 0)}"
+            )
+            stages = stats.get('latency', {}).get('stages')
+            if stages:
+                st.markdown("#### ⏱️ Stage Latency (ms)")
+                st.dataframe(pd.DataFrame(stages).T.round(2), use_container_width=True)
         except:
             pass
 
@@ -320,64 +301,107 @@ if query_button:
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         st.session_state["query_history"].append((question, timestamp))
         
-        # Show progress
+        # Progress reflects real pipeline stages as stream events arrive
         progress_bar = st.progress(0)
         status_text = st.empty()
         
         status_text.text("🔍 Retrieving relevant documents...")
         progress_bar.progress(25)
         
-        with st.spinner("Processing your query..."):
-            time.sleep(0.5)  # Brief pause for UX
-            status_text.text("🤖 Generating response...")
-            progress_bar.progress(75)
+        st.markdown("## 🎯 Results")
+        answer_placeholder = st.empty()
+        sources_container = st.container()
+        
+        def render_answer(text):
+            answer_placeholder.markdown(
+                f"""
+                <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
+                    <b>💬 Answer:</b><br>{text}
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+        
+        try:
+            answer = ""
+            for event, data in rag_system.stream_query(
+                question=question,
+                method_name=chunking_method,
+                prompt_method=prompt_method
+            ):
+                if event == "sources":
+                    status_text.text("🤖 Generating response...")
+                    progress_bar.progress(50)
+                    source_docs = data.get("source_documents", [])
+                    with sources_container:
+                        # Styled Source Documents section
+                        st.markdown(
+                            f"""
+                            <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
+                                <b>Source Documents</b><br>
+                                Found {len(source_docs)} relevant document chunk{'s' if len(source_docs)!=1 else ''}:
+                            </div>
+                            """,
+                            unsafe_allow_html=True
+                        )
+                        for doc in source_docs:
+                            st.code(doc["content"])
+                elif event == "token":
+                    answer += data["text"]
+                    render_answer(answer + "▌")
+                elif event == "done":
+                    progress_bar.progress(100)
+                    status_text.text("✅ Query completed!")
+                elif event == "error":
+                    raise RuntimeError(data["error"])
+            render_answer(answer or "No answer")
+            
+            # Clear progress indicators
+            progress_bar.empty()
+            status_text.empty()
             
+        except Exception as e:
+            st.error(f"❌ Error processing query: {str(e)}")
+            progress_bar.empty()
+            status_text.empty()
+    else:
+        st.warning("⚠️ Please enter a question before querying.")
+
+# Handle compare-all: every chunking method is queried concurrently
+if compare_button:
+    if question.strip():
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        st.session_state["query_history"].append((question, timestamp))
+        
+        with st.spinner("Querying all chunking methods..."):
             try:
-                result = rag_system.query_with_method(
+                results = rag_system.compare_methods(
                     question=question,
-                    method_name=chunking_method,
                     prompt_method=prompt_method,
                     custom_prompt=None
                 )
-                progress_bar.progress(100)
-                status_text.text("✅ Query completed!")
-                
-                # Display results
-                st.markdown("## 🎯 Results")
-                
-                # Answer section
-                answer = result.get('answer', 'No answer')
-                st.markdown(
-                    f"""
-                    <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
-                        <b>💬 Answer:</b><br>{answer}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-                
-                # Styled Source Documents section
-                source_docs = result.get("source_documents", [])
-                st.markdown(
-                    f"""
-                    <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
-                        <b>Source Documents</b><br>
-                        Found {len(source_docs)} relevant document chunk{'s' if len(source_docs)!=1 else ''}:
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-                for doc in source_docs:
-                    st.code(doc["content"])
-                
-                # Clear progress indicators
-                progress_bar.empty()
-                status_text.empty()
-                
+                st.markdown("## ⚖️ Method Comparison")
+                method_columns = st.columns(len(CHUNKING_METHODS))
+                for column, (key, label, desc) in zip(method_columns, CHUNKING_METHODS):
+                    result = results.get(key, {})
+                    with column:
+                        st.markdown(f"### {label}")
+                        if "error" in result:
+                            st.error(f"❌ {result['error']}")
+                            continue
+                        st.markdown(
+                            f"""
+                            <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
+                                <b>💬 Answer:</b><br>{result.get('answer', 'No answer')}
+                            </div>
+                            """,
+                            unsafe_allow_html=True
+                        )
+                        with st.expander(f"Source Documents ({len(result.get('source_documents', []))})"):
+                            for doc in result.get("source_documents", []):
+                                st.code(doc["content"])
             except Exception as e:
-                st.error(f"❌ Error processing query: {str(e)}")
-                progress_bar.empty()
-                status_text.empty()
+                st.error(f"❌ Error comparing methods: {str(e)}")
     else:
         st.warning("⚠️ Please enter a question before querying.")
 
@@ -395,10 +419,23 @@ if analyze_button:
                     with st.expander(f"📋 {method.replace('_', ' ').title()}", expanded=True):
                         if isinstance(data, dict):
                             for key, value in data.items():
-                                st.metric(
-                                    label=key.replace('_', ' ').title(),
-                                    value=value
-                                )
+                                label = key.replace('_', ' ').title()
+                                if key == "length_histogram" and value.get("counts"):
+                                    st.markdown(f"**{label}**")
+                                    edges = value["edges"]
+                                    st.bar_chart(pd.Series(
+                                        value["counts"],
+                                        index=[f"{edges[i]:.0f}-{edges[i + 1]:.0f}" for i in range(len(value["counts"]))],
+                                        name="chunks"
+                                    ))
+                                elif isinstance(value, dict):
+                                    st.markdown(f"**{label}**")
+                                    st.json(value)
+                                else:
+                                    st.metric(
+                                        label=label,
+                                        value="N/A" if value is None else value
+                                    )
                         else:
                             st.write(data)
             else:
@@ -410,55 +447,32 @@ if analyze_button:
 # --- Evaluation Section ---
 st.markdown("---")
 st.header("🔍 Evaluate RAG System on Standard Questions")
-if st.button("Run Evaluation"):
+eval_methods = st.multiselect(
+    "Chunking methods", [key for key, _, _ in CHUNKING_METHODS], default=["fixed_size"]
+)
+eval_prompt_methods = st.multiselect(
+    "Prompting methods", prompt_method_keys, default=["zero_shot"],
+    format_func=lambda key: PROMPTING_METHODS[key]
+)
+if not eval_methods or not eval_prompt_methods:
+    st.warning("⚠️ Select at least one chunking method and one prompting method to run an evaluation.")
+if st.button("Run Evaluation", disabled=not eval_methods or not eval_prompt_methods):
+    try:
+        runner = EvaluationRunner(rag_system, methods=eval_methods, prompt_methods=eval_prompt_methods)
+    except ValueError as e:
+        st.error(f"❌ {str(e)}")
+        st.stop()
+    progress_bar = st.progress(0.0)
     with st.spinner("Evaluating..."):
-        f1_scores = []
-        results = []
-        for item in EVAL_SET:
-            try:
-                result = rag_system.query_with_method(
-                    question=item['question'],
-                    method_name='fixed_size',  # or any default method
-                    prompt_method='zero_shot',
-                    custom_prompt=None
-                )
-                answer = result.get('answer', '')
-                f1 = compute_f1(answer, item['reference'])
-                f1_scores.append(f1)
-                results.append({
-                    'question': item['question'],
-                    'answer': answer,
-                    'reference': item['reference'],
-                    'f1': f1
-                })
-            except Exception as e:
-                f1_scores.append(0.0)
-                results.append({
-                    'question': item['question'],
-                    'answer': f'Error: {e}',
-                    'reference': item['reference'],
-                    'f1': 0.0
-                })
-        avg_f1 = sum(f1_scores) / len(f1_scores) if f1_scores else 0.0
-        st.markdown(
-            f"""
-            <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
-                <b>Average F1 score:</b> {avg_f1:.3f}
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        for res in results:
+        records = runner.run(progress=lambda done, total: progress_bar.progress(done / total))
+    summary = pd.DataFrame(runner.summarize(records))
+    st.dataframe(summary, use_container_width=True)
+    for res in sorted(records, key=lambda r: (r['method'], r['prompt_method'], r['question'])):
+        with st.expander(f"{res['method']} / {res['prompt_method']}: {res['question']}"):
+            st.markdown(f"**Pred:** {res['error'] and 'Error: ' + res['error'] or res['answer']}")
             st.markdown(
-                f"""
-                <div style='background:#222; color:#fff; padding:1em; border-radius:8px; margin-bottom:1em;'>
-                    <b>Q:</b> {res['question']}<br>
-                    <b>Pred:</b> {res['answer']}<br>
-                    <b>Ref:</b> {res['reference']}<br>
-                    <b>F1:</b> {res['f1']:.3f}
-                </div>
-                """,
-                unsafe_allow_html=True
+                f"**F1:** {res['f1']:.3f} · **Latency:** {res['latency_seconds']:.2f}s · "
+                f"**Tokens:** {res['context_tokens']} context / {res['answer_tokens']} answer"
             )
 
 # Footer
@@ -0,0 +1,113 @@
+"""Shared helpers for the benchmark suites: timing, synthetic data, result records and baseline comparison."""
+import os
+import sys
+import time
+import random
+import platform
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+WORDS = (
+    "quantum qubit superposition entanglement algorithm cryptography error correction coherence "
+    "decoherence gate circuit measurement state vector amplitude interference optimization simulation "
+    "hardware photon trapped ion superconducting annealing factorization lattice security research "
+    "the a of and to in is that for with as on by this are be from at which can"
+).split()
+
+
+def metric(value, unit, higher_is_better):
+    """higher_is_better=None marks an informational value that is recorded but never compared"""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_of(fn, repeat=5):
+    """Fastest wall-clock time of repeat calls to fn, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def percentile(values, q):
+    from rag.evaluation import percentile as _percentile
+    return _percentile(values, q)
+
+
+def synthetic_text(n_chars, seed=0):
+    """Deterministic prose-like text: sentences of 8-24 words, paragraphs of 3-8 sentences"""
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < n_chars:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        parts.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(parts)[:n_chars]
+
+
+def synthetic_vectors(n, dim, seed=0):
+    """Unit-norm float32 vectors with some cluster structure, like sentence embeddings"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 1000, 16), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def create_embeddings(kind, dim=384):
+    """Base embeddings for the suites: "fake" is offline and deterministic, "model" loads MiniLM"""
+    if kind == "model":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=dim)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows for every metric present in both; a row regresses when it is worse by more than tolerance"""
+    rows = []
+    for name, base in sorted(baseline.items()):
+        current = results.get(name)
+        if current is None or base["higher_is_better"] is None:
+            continue
+        if base["value"]:
+            change = (current["value"] - base["value"]) / base["value"]
+        else:
+            # e.g. an error count that was zero: any increase is a regression
+            change = float("inf") if current["value"] > 0 else 0.0
+        worse_by = -change if base["higher_is_better"] else change
+        rows.append({
+            "name": name,
+            "baseline": base["value"],
+            "current": current["value"],
+            "unit": base["unit"],
+            "change": change,
+            "regressed": worse_by > tolerance,
+        })
+    return rows
@@ -0,0 +1,106 @@
+"""Guard against import-time regressions.
+
+Each entry point is imported in a fresh interpreter with ``-X importtime``.
+The check fails if an entry point pulls in one of the heavy dependencies
+that are meant to load lazily, or if its cumulative import time exceeds its
+budget. Run from the repository root:
+
+    python benchmarks/import_time.py [--repeat 5] [--json results.json]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> cumulative import budget in milliseconds
+BUDGETS_MS = {
+    "rag.PromptGenerator": 20,
+    "rag.rag_system": 100,
+    "routes": 500,
+}
+
+# Must only be imported once a RAGSystem actually needs them
+HEAVY_MODULES = (
+    "torch", "sentence_transformers", "transformers", "sklearn",
+    "numpy", "faiss", "langchain", "langchain_core", "langchain_community",
+    "langchain_huggingface", "langchain_groq", "groq",
+)
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _import_lines(statement):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr[-2000:]}")
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            yield int(cumulative), len(indent), name
+
+
+def measure(module, startup_modules):
+    """Cumulative import time (ms) of module and the set of modules it imported"""
+    total_us = 0
+    imported = set()
+    for cumulative, indent, name in _import_lines(f"import {module}"):
+        if name in startup_modules:
+            continue
+        imported.add(name)
+        # Top-level entries are what "import module" triggered directly
+        if indent == 1:
+            total_us += cumulative
+    return total_us / 1000, imported
+
+
+def run(repeat=5, verbose=True):
+    """Measure every entry point; returns (results, failure messages)"""
+    # Interpreter start-up (site, encodings, ...) is not charged to the entry points
+    startup_modules = {name for _, _, name in _import_lines("pass")}
+    results = {}
+    failures = []
+    for module, budget_ms in BUDGETS_MS.items():
+        runs = [measure(module, startup_modules) for _ in range(repeat)]
+        best_ms = min(ms for ms, _ in runs)
+        heavy = sorted(
+            name for name in runs[0][1]
+            if name.split(".")[0] in HEAVY_MODULES
+        )
+        results[module] = {"cumulative_ms": round(best_ms, 2), "budget_ms": budget_ms, "heavy_imports": heavy}
+        status = "ok"
+        if heavy:
+            status = "FAIL (heavy imports)"
+            failures.append(f"{module} imports {', '.join(heavy[:10])}")
+        elif best_ms > budget_ms:
+            status = "FAIL (over budget)"
+            failures.append(f"{module} took {best_ms:.1f} ms (budget {budget_ms} ms)")
+        if verbose:
+            print(f"{module:<25} {best_ms:8.1f} ms  budget {budget_ms:>5} ms  {status}")
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per entry point; the fastest is kept")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results, failures = run(args.repeat)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
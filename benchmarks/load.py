@@ -0,0 +1,111 @@
+"""End-to-end /query throughput under concurrent load, through the Flask test client.
+
+The LLM is the offline fake backend (RAG_LLM_BACKEND=fake) with a fixed
+simulated latency, and the answer cache is off, so every request runs
+retrieval, context assembly and the chain. Each request uses a distinct
+question so request coalescing does not merge them.
+
+    python benchmarks/load.py [--requests 200] [--concurrency 1 8 32] [--llm-latency 0.05]
+"""
+import os
+import json
+import time
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common import REPO_ROOT, create_embeddings, metric, percentile
+
+QUESTIONS = [
+    "What is quantum computing and how does it differ from classical computing?",
+    "What are qubits, superposition, and entanglement in quantum computing?",
+    "How could quantum computing impact cryptography and data security?",
+    "What are some real-world applications of quantum computing?",
+    "What are the main challenges and future trends in quantum computing?",
+]
+
+
+def create_app(embeddings="fake", llm_latency=0.05):
+    """Flask app with the RAG blueprint serving a freshly built RAGSystem on the fake LLM"""
+    from flask import Flask
+    from rag.rag_system import RAGSystem
+    from routes import rag_routes
+
+    class BenchmarkRAGSystem(RAGSystem):
+        def _create_base_embeddings(self, workers):
+            return create_embeddings(embeddings)
+
+    os.environ["RAG_FAKE_LLM_LATENCY"] = str(llm_latency)
+    system = BenchmarkRAGSystem(
+        index_cache_dir=tempfile.mkdtemp(prefix="rag-bench-"),
+        answer_cache_mode="off",
+        document_paths=[os.path.join(REPO_ROOT, "sample_document.txt")],
+        llm_backend="fake",
+        llm_concurrency=256,
+    )
+    system.warm_up()
+    # Mark the blueprint's startup as done so registering it doesn't build a second system
+    now = time.time()
+    rag_routes._startup.update(phase="ready", started_at=now, ready_at=now)
+    rag_routes.rag_system = system
+    app = Flask(__name__)
+    app.register_blueprint(rag_routes.bp)
+    return app
+
+
+def run_load(app, n_requests, concurrency, method="fixed_size"):
+    local = threading.local()
+
+    def request(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        payload = {"question": f"{QUESTIONS[i % len(QUESTIONS)]} (request {i})", "method": method}
+        start = time.perf_counter()
+        response = client.post("/query", json=payload)
+        latency = time.perf_counter() - start
+        return latency, response.status_code == 200 and "error" not in response.get_json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(request, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, ok in outcomes if ok]
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_p50_ms": 1000 * percentile(latencies, 50),
+        "latency_p95_ms": 1000 * percentile(latencies, 95),
+        "errors": n_requests - len(latencies),
+    }
+
+
+def run(quick=False, n_requests=None, concurrency=None, embeddings="fake", llm_latency=0.05):
+    n_requests = n_requests or (50 if quick else 200)
+    concurrency = concurrency or ((1, 8) if quick else (1, 8, 32))
+    app = create_app(embeddings, llm_latency)
+    run_load(app, min(n_requests, 10), 1)  # warm-up
+    results = {}
+    for level in concurrency:
+        row = run_load(app, n_requests, level)
+        prefix = f"load.query.c{level}"
+        results[f"{prefix}.requests_per_second"] = metric(row["requests_per_second"], "req/s", True)
+        results[f"{prefix}.latency_p50_ms"] = metric(row["latency_p50_ms"], "ms", False)
+        results[f"{prefix}.latency_p95_ms"] = metric(row["latency_p95_ms"], "ms", False)
+        results[f"{prefix}.errors"] = metric(row["errors"], "requests", False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer requests, for CI")
+    parser.add_argument("--requests", type=int, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="concurrent clients, e.g. 1 8 32")
+    parser.add_argument("--embeddings", choices=("fake", "model"), default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="simulated seconds per LLM call")
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick, args.requests, args.concurrency, args.embeddings, args.llm_latency), indent=2))
+
+
+if __name__ == "__main__":
+    main()
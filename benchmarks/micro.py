@@ -0,0 +1,136 @@
+"""Micro-benchmarks: splitters, embeddings, FAISS build/search, compact storage and prompt rendering.
+
+Every suite returns {metric_name: {"value", "unit", "higher_is_better"}}.
+Run on its own to print the numbers, or through benchmarks/run.py to
+record them and compare against a baseline:
+
+    python benchmarks/micro.py [--quick] [--sizes 1000 10000] [--embeddings fake|model]
+"""
+import os
+import json
+import argparse
+
+from common import REPO_ROOT, best_of, create_embeddings, metric, synthetic_text, synthetic_vectors
+
+
+def bench_splitters(n_chars=1_000_000):
+    from langchain_core.documents import Document
+    from rag.rag_system import RAGSystem
+    documents = [Document(page_content=synthetic_text(n_chars), metadata={"source": "synthetic"})]
+    results = {}
+    for method_name, splitter in RAGSystem.create_chunking_methods().items():
+        chunks = splitter.split_documents(documents)
+        seconds = best_of(lambda: splitter.split_documents(documents))
+        results[f"splitters.{method_name}.chars_per_second"] = metric(n_chars / seconds, "chars/s", True)
+        results[f"splitters.{method_name}.chunks"] = metric(len(chunks), "chunks", None)
+    return results
+
+
+def bench_embeddings(kind="fake", n_texts=2000):
+    """Raw backend throughput, then CachedEmbeddings cold (all misses) and warm (all hits)"""
+    import tempfile
+    from rag.embedding_cache import CachedEmbeddings
+    texts = [synthetic_text(400, seed=i) for i in range(n_texts)]
+    base = create_embeddings(kind)
+    base.embed_documents(texts[:8])  # model load / warm-up
+    results = {
+        f"embeddings.{kind}.backend_texts_per_second": metric(n_texts / best_of(lambda: base.embed_documents(texts), 1), "texts/s", True),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CachedEmbeddings(lambda: base, model_name=kind, cache_path=os.path.join(tmp, "embeddings.sqlite3"))
+        cold = best_of(lambda: cache.embed_documents(texts), 1)
+        warm = best_of(lambda: cache.embed_documents(texts))
+    results[f"embeddings.{kind}.cached_cold_texts_per_second"] = metric(n_texts / cold, "texts/s", True)
+    results[f"embeddings.{kind}.cached_warm_texts_per_second"] = metric(n_texts / warm, "texts/s", True)
+    return results
+
+
+def bench_faiss(sizes=(1_000, 10_000, 100_000), dim=384, n_queries=200, k=10):
+    """Exact build/search at each corpus size, plus recall and latency of the ANN index types"""
+    import faiss
+    from rag.ann_index import recall_latency_report
+    results = {}
+    for n in sizes:
+        vectors = synthetic_vectors(n, dim)
+        queries = synthetic_vectors(n_queries, dim, seed=1)
+        index = faiss.IndexFlatL2(dim)
+        build = best_of(lambda: (index.reset(), index.add(vectors)), 1)
+        search = best_of(lambda: index.search(queries, k))
+        results[f"faiss.flat.n{n}.build_seconds"] = metric(build, "s", False)
+        results[f"faiss.flat.n{n}.search_ms_per_query"] = metric(1000 * search / n_queries, "ms", False)
+        # HNSW construction at 10^6 takes many minutes; the exact index covers that size
+        if n > 100_000:
+            continue
+        configs = {"ivf": {"type": "ivf"}, "hnsw": {"type": "hnsw"}}
+        if n >= 39 * 256:
+            configs["ivfpq"] = {"type": "ivfpq"}
+        for row in recall_latency_report(vectors, queries, k=k, configs=configs):
+            prefix = f"faiss.{row['config']}.n{n}"
+            results[f"{prefix}.build_seconds"] = metric(row["build_seconds"], "s", False)
+            results[f"{prefix}.search_ms_per_query"] = metric(row["latency_ms_per_query"], "ms", False)
+            results[f"{prefix}.recall_at_{k}"] = metric(row[f"recall@{k}"], "ratio", True)
+    return results
+
+
+def bench_compact_storage(n=100_000, dim=384, n_queries=200, k=10):
+    """Bytes per vector, recall@k and search latency of the compact fp16/int8 files versus exact float32"""
+    import tempfile
+    import faiss
+    from langchain_core.documents import Document
+    from rag.compact_store import COMPACT_DTYPES, CompactStore
+    vectors = synthetic_vectors(n, dim)
+    queries = synthetic_vectors(n_queries, dim, seed=1)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    _, truth = index.search(queries, k)
+    ids = [str(i) for i in range(n)]
+    documents = [Document(page_content="", metadata={}) for _ in range(n)]
+    results = {f"compact.float32.n{n}.bytes_per_vector": metric(4 * dim, "bytes", None)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in COMPACT_DTYPES:
+            path = os.path.join(tmp, dtype)
+            CompactStore.write(path, index, ids, documents, dtype, stamp="")
+            store = CompactStore.open(path)
+            search = best_of(lambda: store.search(queries, k), 3)
+            _, found = store.search(queries, k)
+            recall = sum(len(set(a) & set(b)) for a, b in zip(found, truth)) / truth.size
+            prefix = f"compact.{dtype}.n{n}"
+            results[f"{prefix}.bytes_per_vector"] = metric(store.vectors.nbytes / n, "bytes", None)
+            results[f"{prefix}.search_ms_per_query"] = metric(1000 * search / n_queries, "ms", False)
+            results[f"{prefix}.recall_at_{k}"] = metric(recall, "ratio", True)
+    return results
+
+
+def bench_prompts(iterations=2000):
+    from rag.PromptGenerator import PromptGenerator, PROMPTING_METHODS
+    with open(os.path.join(REPO_ROOT, "sample_document.txt"), encoding="utf-8") as f:
+        article = f.read()
+    results = {}
+    for method in PROMPTING_METHODS:
+        seconds = best_of(lambda: [PromptGenerator.create_prompt_by_method(article, method) for _ in range(iterations)])
+        results[f"prompts.{method}.render_us"] = metric(1e6 * seconds / iterations, "us", False)
+    return results
+
+
+def run(quick=False, sizes=None, embeddings="fake"):
+    sizes = sizes or ((1_000, 10_000) if quick else (1_000, 10_000, 100_000))
+    results = {}
+    results.update(bench_splitters(200_000 if quick else 1_000_000))
+    results.update(bench_embeddings(embeddings, 500 if quick else 2000))
+    results.update(bench_faiss(sizes))
+    results.update(bench_compact_storage(10_000 if quick else 100_000))
+    results.update(bench_prompts(200 if quick else 2000))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for CI")
+    parser.add_argument("--sizes", type=int, nargs="+", help="FAISS corpus sizes, e.g. 1000 10000 100000 1000000")
+    parser.add_argument("--embeddings", choices=("fake", "model"), default="fake")
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick, args.sizes, args.embeddings), indent=2))
+
+
+if __name__ == "__main__":
+    main()
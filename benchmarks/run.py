@@ -0,0 +1,103 @@
+"""Run the benchmark suites, write the results as JSON and compare them against a baseline.
+
+Everything runs offline: the LLM is the fake backend and embeddings default
+to a deterministic fake (pass --embeddings model to measure MiniLM).
+Exits non-zero when any metric is worse than the baseline by more than
+--tolerance, when there is no baseline to compare against, or when the
+import-time check fails. Run from the repository root:
+
+    python benchmarks/run.py [--quick] [--suites micro load import_time]
+                             [--output bench_results.json] [--baseline benchmarks/baseline.json]
+                             [--tolerance 0.25] [--update-baseline | --no-compare]
+
+Baselines are machine-specific, so none is committed. Record one on the
+machine that will run the comparison (e.g. cache it on the CI runner), with
+the same --quick setting the comparison will use:
+
+    python benchmarks/run.py --quick --update-baseline   # once, and after accepted changes
+    python benchmarks/run.py --quick                     # every run; fails on regressions
+
+--no-compare only writes the results, for exploratory runs.
+"""
+import os
+import sys
+import json
+import argparse
+
+from common import REPO_ROOT, compare, environment, metric
+
+SUITES = ("micro", "load", "import_time")
+
+
+def run_import_time():
+    import import_time
+    results, failures = import_time.run(verbose=False)
+    metrics = {
+        f"import_time.{module}.cumulative_ms": metric(row["cumulative_ms"], "ms", False)
+        for module, row in results.items()
+    }
+    return metrics, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for CI")
+    parser.add_argument("--sizes", type=int, nargs="+", help="FAISS corpus sizes (default 10^3..10^5; up to 10^6)")
+    parser.add_argument("--embeddings", choices=("fake", "model"), default="fake")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=os.path.join(REPO_ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument("--update-baseline", "--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--no-compare", action="store_true", help="only write the results; no baseline needed")
+    args = parser.parse_args()
+
+    results, failures = {}, []
+    if "micro" in args.suites:
+        import micro
+        results.update(micro.run(args.quick, args.sizes, args.embeddings))
+    if "load" in args.suites:
+        import load
+        results.update(load.run(args.quick, embeddings=args.embeddings))
+    if "import_time" in args.suites:
+        import_metrics, import_failures = run_import_time()
+        results.update(import_metrics)
+        failures.extend(import_failures)
+
+    report = {"environment": environment(), "quick": args.quick, "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} metrics to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif args.no_compare:
+        pass
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("Warning: baseline was recorded with a different --quick setting", file=sys.stderr)
+        rows = compare(results, baseline["results"], args.tolerance)
+        for row in rows:
+            flag = "REGRESSION" if row["regressed"] else ""
+            print(f"{row['name']:<55} {row['baseline']:>12.4g} -> {row['current']:>12.4g} {row['unit']:<8} "
+                  f"{row['change']:+7.1%} {flag}")
+        failures.extend(
+            f"{row['name']}: {row['baseline']:.4g} -> {row['current']:.4g} {row['unit']} ({row['change']:+.1%})"
+            for row in rows if row["regressed"]
+        )
+    else:
+        # Passing silently would let a misconfigured CI job (no baseline restored) never catch a regression
+        failures.append(f"No baseline at {args.baseline}; record one with --update-baseline or pass --no-compare")
+
+    if failures:
+        print("\nFAILED:\n" + "\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
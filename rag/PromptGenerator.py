@@ -1,6 +1,10 @@
 import re
+from functools import lru_cache
 from typing import Dict, Callable
 
+# Whole-prompt token budget (template + retrieved context); RAGSystem reads RAG_PROMPT_TOKEN_BUDGET over it
+DEFAULT_PROMPT_TOKEN_BUDGET = 1000
+
 class PromptGenerator:
     @staticmethod
     def count_words(text: str) -> int:
@@ -214,6 +218,19 @@ Answer:"""
         else:
             return cls.create_zero_shot_prompt(article)
 
+    @classmethod
+    def context_token_budget(cls, method: str, prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+                             minimum: int = 200) -> int:
+        """Approximate tokens left for retrieved context once the template's own text is counted"""
+        template_tokens = len(re.findall(r"\w+|[^\w\s]", cls.get_template(method)))
+        return max(prompt_token_budget - template_tokens, minimum)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_template(cls, method: str) -> str:
+        """Template for method; the templates only use the {context} placeholder, so no article is needed"""
+        return cls.create_prompt_by_method("", method)
+
 PROMPTING_METHODS = {
     'default': 'Default',
     'chain_of_thoughts': 'Chain-of-Thoughts',
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import math
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+ANN_INDEX_FILE = "ann.faiss"
+ANN_TRAINED_FILE = "ann.trained.faiss"
+ANN_META_FILE = "ann.json"
+RETRAIN_GROWTH = 4  # retrain IVF centroids once the corpus is this many times larger (or smaller)
+
+
+def content_stamp(index_to_docstore_id: dict) -> str:
+    """Identifies the exact set and order of vectors an ANN index was built from"""
+    ids = "\n".join(index_to_docstore_id[i] for i in range(len(index_to_docstore_id)))
+    return hashlib.sha1(ids.encode("utf-8")).hexdigest()
+
+
+class AnnIndex:
+    """Approximate search structure derived from a method's exact (flat) FAISS index.
+
+    The flat index stays the source of truth for ingestion; this index is
+    rebuilt from its vectors whenever they change and answers searches with
+    the same positions, so results map through the store's index_to_docstore_id.
+    Trained parameters (IVF centroids, PQ codebooks) are kept and reused on
+    rebuilds until the configuration changes.
+    """
+
+    def __init__(self, index_type: str = "flat", params: Optional[dict] = None):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+        self.requested_type = index_type
+        self.index_type = index_type  # may fall back to a simpler type for small corpora
+        self.params = dict(params or {})
+        self.index = None
+        self.trained = None  # empty, trained copy used as the template for rebuilds
+        self.trained_at = 0  # number of vectors the template was trained on
+        self.stamp = None
+
+    def _nlist(self, n: int) -> int:
+        # ~39 training points per centroid is FAISS's minimum for stable k-means
+        nlist = self.params.get("nlist") or int(4 * math.sqrt(n))
+        return max(1, min(nlist, n // 39 or 1))
+
+    def _pq_m(self, d: int) -> int:
+        m = self.params.get("pq_m") or d // 8
+        while d % m:
+            m -= 1
+        return m
+
+    def _new_index(self, d: int, n: int):
+        if self.index_type == "flat":
+            return faiss.IndexFlatL2(d)
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(d, self.params.get("m", 32))
+            index.hnsw.efConstruction = self.params.get("ef_construction", 80)
+            return index
+        quantizer = faiss.IndexFlatL2(d)
+        if self.index_type == "ivf":
+            return faiss.IndexIVFFlat(quantizer, d, self._nlist(n))
+        return faiss.IndexIVFPQ(quantizer, d, self._nlist(n), self._pq_m(d), self.params.get("pq_bits", 8))
+
+    def _apply_search_params(self) -> None:
+        if self.index_type in ("ivf", "ivfpq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.params.get("nprobe", 8)
+        elif self.index_type == "hnsw":
+            self.index.hnsw.efSearch = self.params.get("ef_search", 64)
+
+    def _effective_type(self, n: int) -> str:
+        # PQ codebooks need ~39 points per code to train; below that fall back to plain IVF
+        if self.requested_type == "ivfpq" and n < 39 * 2 ** self.params.get("pq_bits", 8):
+            return "ivf"
+        return self.requested_type
+
+    def build(self, vectors: np.ndarray, stamp: Optional[str] = None) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n, d = vectors.shape
+        index_type = self._effective_type(n)
+        if index_type != self.index_type:
+            # Crossing the PQ threshold in either direction needs a template of the other type
+            if index_type == self.requested_type:
+                logging.info(f"{n} vectors (trained on {self.trained_at}); retraining as {index_type}")
+            else:
+                logging.warning(f"Only {n} vectors; too few to train IVF-PQ, using IVF instead")
+            self.index_type = index_type
+            self.trained = None
+        elif self.trained is not None and self.index_type in ("ivf", "ivfpq") and \
+                not self.trained_at / RETRAIN_GROWTH <= n <= self.trained_at * RETRAIN_GROWTH:
+            # nlist was sized for trained_at vectors; far off that, lists get too long (or sparse)
+            logging.info(f"{n} vectors (trained on {self.trained_at}); retraining {self.index_type} centroids")
+            self.trained = None
+        if self.trained is None or self.trained.d != d:
+            template = self._new_index(d, n)
+            if not template.is_trained:
+                sample = vectors
+                train_size = self.params.get("train_size", 100_000)
+                if n > train_size:
+                    sample = vectors[np.random.default_rng(0).choice(n, train_size, replace=False)]
+                template.train(sample)
+            self.trained = template
+            self.trained_at = n
+        self.index = faiss.clone_index(self.trained)
+        self.index.add(vectors)
+        self.stamp = stamp
+        self._apply_search_params()
+
+    def search(self, vectors: np.ndarray, k: int):
+        return self.index.search(np.ascontiguousarray(vectors, dtype=np.float32), k)
+
+    def size_bytes(self) -> int:
+        return int(faiss.serialize_index(self.index).nbytes) if self.index is not None else 0
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name, index in ((ANN_INDEX_FILE, self.index), (ANN_TRAINED_FILE, self.trained)):
+            tmp_path = os.path.join(directory, f"{name}.tmp-{os.getpid()}")
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, os.path.join(directory, name))
+        with open(os.path.join(directory, ANN_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "requested_type": self.requested_type,
+                "type": self.index_type,
+                "trained_at": self.trained_at,
+                "params": self.params,
+                "stamp": self.stamp
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, index_type: str, params: dict) -> Optional["AnnIndex"]:
+        """Saved index for this configuration, or None if absent or configured differently"""
+        try:
+            with open(os.path.join(directory, ANN_META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["requested_type"] != index_type or meta["params"] != params:
+                return None
+            ann = cls(index_type, params)
+            ann.index_type = meta["type"]
+            ann.trained_at = meta.get("trained_at", 0)
+            ann.trained = faiss.read_index(os.path.join(directory, ANN_TRAINED_FILE))
+            ann.index = faiss.read_index(os.path.join(directory, ANN_INDEX_FILE), faiss.IO_FLAG_MMAP)
+            ann.stamp = meta["stamp"]
+            ann._apply_search_params()
+            return ann
+        except (OSError, ValueError, KeyError, RuntimeError):
+            return None
+
+
+def recall_latency_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                          configs: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """Recall@k and per-query latency of each index configuration against exact search"""
+    configs = configs or {
+        "flat": {"type": "flat"},
+        "ivf": {"type": "ivf"},
+        "hnsw": {"type": "hnsw"},
+        "ivfpq": {"type": "ivfpq"},
+    }
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    report = []
+    for name, config in configs.items():
+        params = {key: value for key, value in config.items() if key != "type"}
+        ann = AnnIndex(config.get("type", "flat"), params)
+        start = time.perf_counter()
+        ann.build(vectors)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        _, found = ann.search(queries, k)
+        search_seconds = time.perf_counter() - start
+        hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+        report.append({
+            "config": name,
+            "index_type": ann.index_type,
+            "params": params,
+            f"recall@{k}": hits / truth.size if truth.size else 0.0,
+            "latency_ms_per_query": 1000 * search_seconds / max(len(queries), 1),
+            "build_seconds": build_seconds,
+            "size_bytes": ann.size_bytes(),
+        })
+    return report
@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+ANSWER_CACHE_MODES = ("off", "exact", "semantic")
+
+
+def chunk_id(doc: Document) -> str:
+    """Stable identifier for a retrieved chunk"""
+    if doc.metadata.get("chunk_id"):
+        return doc.metadata["chunk_id"]
+    payload = f"{doc.metadata.get('source', '')}\0{doc.page_content}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+
+
+class InMemoryAnswerBackend:
+    """LRU + TTL store living in the current process"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl is not None and time.time() - entry["created"] > self.ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def scan(self, scope: str) -> List[tuple]:
+        """(key, entry) pairs in scope, most recently used last"""
+        with self._lock:
+            return [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["scope"] == scope and not self._expired(entry)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteAnswerBackend:
+    """LRU + TTL store in a SQLite file, shared by processes on the same host"""
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, scope TEXT NOT NULL, "
+            "answer TEXT NOT NULL, vector BLOB, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+        self._db.commit()
+
+    def _min_created(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    @staticmethod
+    def _entry(row) -> dict:
+        scope, answer, vector, created = row
+        return {
+            "scope": scope,
+            "answer": answer,
+            "vector": np.frombuffer(vector, dtype=np.float32) if vector is not None else None,
+            "created": created,
+        }
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT scope, answer, vector, created FROM answers WHERE key = ? AND created >= ?",
+                (key, self._min_created())
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return self._entry(row)
+
+    def set(self, key: str, entry: dict) -> None:
+        vector = entry.get("vector")
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, scope, answer, vector, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry["scope"], entry["answer"],
+                 vector.tobytes() if vector is not None else None, entry["created"], time.time())
+            )
+            self._db.execute("DELETE FROM answers WHERE created < ?", (self._min_created(),))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._db.commit()
+
+    def scan(self, scope: str) -> List[tuple]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, scope, answer, vector, created FROM answers "
+                "WHERE scope = ? AND created >= ? ORDER BY last_used",
+                (scope, self._min_created())
+            ).fetchall()
+        return [(row[0], self._entry(row[1:])) for row in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+
+class AnswerCache:
+    """Cache of LLM answers for a given prompt method and retrieved context.
+
+    In "exact" mode an answer is reused when the prompt method, the retrieved
+    chunk IDs and the normalized question all match. "semantic" mode keeps the
+    same scope (prompt method + chunk IDs) but also accepts a differently
+    worded question whose embedding is within similarity_threshold.
+
+    generation_config (LLM backend, model, token budgets, ...) is hashed into
+    every scope, so answers produced under a different configuration are
+    never served from a shared backend.
+    """
+
+    def __init__(self, backend=None, mode: str = "exact", embeddings=None,
+                 similarity_threshold: float = 0.95, generation_config: Optional[dict] = None):
+        if mode not in ANSWER_CACHE_MODES:
+            raise ValueError(f"Unknown answer cache mode: {mode}")
+        if mode == "semantic" and embeddings is None:
+            raise ValueError("Semantic answer cache needs an embeddings model")
+        self.backend = backend or InMemoryAnswerBackend()
+        self.mode = mode
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.generation_config = dict(generation_config or {})
+        self._generation = hashlib.sha256(
+            json.dumps(self.generation_config, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _scope(self, prompt_method: str, docs: List[Document]) -> str:
+        payload = json.dumps([self._generation, prompt_method, [chunk_id(doc) for doc in docs]])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _key(scope: str, question: str) -> str:
+        return hashlib.sha256(f"{scope}\0{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def _question_vector(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, prompt_method: str, docs: List[Document], question: str) -> Optional[str]:
+        if self.mode == "off":
+            return None
+        scope = self._scope(prompt_method, docs)
+        entry = self.backend.get(self._key(scope, question))
+        if entry is not None:
+            self.hits += 1
+            return entry["answer"]
+        if self.mode == "semantic":
+            candidates = [entry for _, entry in self.backend.scan(scope) if entry["vector"] is not None]
+            if candidates:
+                vector = self._question_vector(question)
+                scores = np.stack([entry["vector"] for entry in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return candidates[best]["answer"]
+        self.misses += 1
+        return None
+
+    def put(self, prompt_method: str, docs: List[Document], question: str, answer: str) -> None:
+        if self.mode == "off":
+            return
+        scope = self._scope(prompt_method, docs)
+        self.backend.set(self._key(scope, question), {
+            "scope": scope,
+            "answer": answer,
+            "vector": self._question_vector(question) if self.mode == "semantic" else None,
+            "created": time.time(),
+        })
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
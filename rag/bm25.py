@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+BM25_META_FILE = "bm25.json"
+BM25_ARRAYS = ("offsets", "doc_indices", "weights", "term_hashes", "term_indices", "doc_ids")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _term_hash(term: str) -> np.uint64:
+    return np.uint64(int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little"))
+
+
+class _HashedVocabulary:
+    """term -> term index via binary search over sorted 64-bit term hashes.
+
+    Unlike a dict it is two flat arrays, so a saved index can be memory-mapped
+    and its pages shared by every worker process.
+    """
+
+    def __init__(self, hashes: np.ndarray, term_indices: np.ndarray):
+        self.hashes = hashes
+        self.term_indices = term_indices
+
+    @classmethod
+    def from_dict(cls, vocabulary: Dict[str, int]) -> "_HashedVocabulary":
+        hashes = np.array([_term_hash(term) for term in vocabulary], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        return cls(hashes[order], np.fromiter(vocabulary.values(), dtype=np.int64, count=len(vocabulary))[order])
+
+    def get(self, term: str) -> Optional[int]:
+        term_hash = _term_hash(term)
+        i = int(np.searchsorted(self.hashes, term_hash))
+        if i < len(self.hashes) and self.hashes[i] == term_hash:
+            return int(self.term_indices[i])
+        return None
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of chunks.
+
+    Postings are stored CSR-style in flat numpy arrays: for term t, entries
+    offsets[t]:offsets[t + 1] of doc_indices/weights hold the chunks that
+    contain it and their precomputed BM25 term weights, so a query is just a
+    few vectorized scatter-adds. A saved index is loaded memory-mapped, so
+    worker processes share its pages instead of each building its own copy.
+    """
+
+    def __init__(self, doc_ids: Sequence[str], vocabulary, offsets: np.ndarray,
+                 doc_indices: np.ndarray, weights: np.ndarray):
+        self.doc_ids = doc_ids  # list of str, or a (mapped) bytes array for a loaded index
+        self.vocabulary = vocabulary  # dict, or a _HashedVocabulary for a loaded index
+        self.offsets = offsets
+        self.doc_indices = doc_indices
+        self.weights = weights
+        self.stamp = None
+
+    @classmethod
+    def build(cls, doc_ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        term_postings = defaultdict(list)  # term -> [(doc_index, term_frequency)]
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_index, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_index] = len(tokens)
+            frequencies = defaultdict(int)
+            for token in tokens:
+                frequencies[token] += 1
+            for token, frequency in frequencies.items():
+                term_postings[token].append((doc_index, frequency))
+
+        n_docs = len(texts)
+        avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        vocabulary = {}
+        offsets = np.zeros(len(term_postings) + 1, dtype=np.int64)
+        total_postings = sum(len(postings) for postings in term_postings.values())
+        doc_indices = np.empty(total_postings, dtype=np.int32)
+        frequencies = np.empty(total_postings, dtype=np.float32)
+        document_frequency = np.empty(len(term_postings), dtype=np.float32)
+        position = 0
+        for term_index, (term, postings) in enumerate(term_postings.items()):
+            vocabulary[term] = term_index
+            for doc_index, frequency in postings:
+                doc_indices[position] = doc_index
+                frequencies[position] = frequency
+                position += 1
+            offsets[term_index + 1] = position
+            document_frequency[term_index] = len(postings)
+
+        idf = np.log1p((n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        posting_idf = np.repeat(idf, np.diff(offsets))
+        length_norm = 1 - b + b * doc_lengths[doc_indices] / (avg_length or 1.0)
+        weights = (posting_idf * frequencies * (k1 + 1) / (frequencies + k1 * length_norm)).astype(np.float32)
+        return cls(list(doc_ids), vocabulary, offsets, doc_indices, weights)
+
+    @classmethod
+    def from_vector_store(cls, vector_store, **kwargs) -> "BM25Index":
+        """Index the chunks of a FAISS store, keyed by their docstore IDs"""
+        doc_ids = list(vector_store.index_to_docstore_id.values())
+        texts = [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        return cls.build(doc_ids, texts, **kwargs)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs; chunks sharing no terms with the query are left out"""
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term_index = self.vocabulary.get(token)
+            if term_index is None:
+                continue
+            start, end = self.offsets[term_index], self.offsets[term_index + 1]
+            # A chunk appears at most once per term, so plain fancy-index addition is safe
+            scores[self.doc_indices[start:end]] += self.weights[start:end]
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._doc_id(i), float(scores[i])) for i in candidates]
+
+    def _doc_id(self, i: int) -> str:
+        doc_id = self.doc_ids[i]
+        return doc_id.decode("utf-8") if isinstance(doc_id, bytes) else doc_id
+
+    def save(self, directory: str, stamp: str) -> None:
+        """Write the postings as .npy files in directory, for load() to memory-map"""
+        vocabulary = self.vocabulary
+        if isinstance(vocabulary, dict):
+            vocabulary = _HashedVocabulary.from_dict(vocabulary)
+        arrays = {
+            "offsets": self.offsets,
+            "doc_indices": self.doc_indices,
+            "weights": self.weights,
+            "term_hashes": vocabulary.hashes,
+            "term_indices": vocabulary.term_indices,
+            "doc_ids": np.array([self._doc_id(i).encode("utf-8") for i in range(len(self.doc_ids))], dtype=bytes),
+        }
+        os.makedirs(directory, exist_ok=True)
+        for name, array in arrays.items():
+            tmp_path = os.path.join(directory, f"bm25.{name}.tmp-{os.getpid()}.npy")
+            np.save(tmp_path, np.asarray(array))
+            os.replace(tmp_path, os.path.join(directory, f"bm25.{name}.npy"))
+        with open(os.path.join(directory, BM25_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"stamp": stamp, "terms": len(vocabulary), "docs": len(self.doc_ids)}, f)
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, directory: str, stamp: str) -> Optional["BM25Index"]:
+        """Saved index for the chunks identified by stamp, memory-mapped; None if absent or stale"""
+        try:
+            with open(os.path.join(directory, BM25_META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["stamp"] != stamp:
+                return None
+            arrays = {
+                name: np.load(os.path.join(directory, f"bm25.{name}.npy"), mmap_mode="r") for name in BM25_ARRAYS
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(arrays["term_hashes"]) != meta["terms"] or len(arrays["doc_ids"]) != meta["docs"]:
+            # Arrays from a different save than the metadata (interrupted write)
+            return None
+        index = cls(arrays["doc_ids"], _HashedVocabulary(arrays["term_hashes"], arrays["term_indices"]),
+                    arrays["offsets"], arrays["doc_indices"], arrays["weights"])
+        index.stamp = stamp
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked ID lists by summing 1 / (k + rank) across lists"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
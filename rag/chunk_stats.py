@@ -0,0 +1,54 @@
+import re
+
+import faiss
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+HISTOGRAM_BINS = 10
+
+
+def approx_token_count(text: str) -> int:
+    """Word-and-punctuation count; close to subword token counts for English prose"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def index_size_bytes(index) -> int:
+    if hasattr(index, "size_bytes"):
+        # An index not yet read from disk (see LazyIndex); its file size avoids loading it
+        return index.size_bytes()
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def compute_chunk_stats(vector_store, manifest: dict) -> dict:
+    """Chunk statistics for one chunking method, computed from its built store and manifest"""
+    chunks = [vector_store.docstore.search(doc_id) for doc_id in vector_store.index_to_docstore_id.values()]
+    lengths = np.array([len(chunk.page_content) for chunk in chunks], dtype=np.int64)
+    tokens = np.array([approx_token_count(chunk.page_content) for chunk in chunks], dtype=np.int64)
+    documents = manifest.get("documents", {})
+    source_chars = [entry.get("chars") for entry in documents.values()]
+    stats = {
+        "total_documents": len(documents),
+        "total_chunks": len(chunks),
+        "avg_chunk_length": float(lengths.mean()) if len(chunks) else 0,
+        "min_chunk_length": int(lengths.min()) if len(chunks) else 0,
+        "max_chunk_length": int(lengths.max()) if len(chunks) else 0,
+        "length_percentiles": {},
+        "length_histogram": {"edges": [], "counts": []},
+        "total_tokens": int(tokens.sum()),
+        "avg_chunk_tokens": float(tokens.mean()) if len(chunks) else 0,
+        "overlap_ratio": None,
+        "index_size_bytes": index_size_bytes(vector_store.index),
+        "sample_chunk": chunks[0].page_content[:200] + "..." if chunks else ""
+    }
+    if len(chunks):
+        stats["length_percentiles"] = {
+            f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(lengths, PERCENTILES))
+        }
+        counts, edges = np.histogram(lengths, bins=HISTOGRAM_BINS)
+        stats["length_histogram"] = {"edges": edges.round(1).tolist(), "counts": counts.tolist()}
+    # Share of chunk text that repeats source text because of splitter overlap
+    if chunks and source_chars and None not in source_chars:
+        chunk_chars = int(lengths.sum())
+        stats["overlap_ratio"] = max(0.0, (chunk_chars - sum(source_chars)) / chunk_chars)
+    return stats
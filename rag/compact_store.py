@@ -0,0 +1,273 @@
+import os
+import json
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+COMPACT_DTYPES = ("fp16", "int8")
+MAGIC = b"RAGCMPT1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+SEARCH_BLOCK_ROWS = 16384  # rows dequantized at a time; bounds scratch memory to ~25 MB at 384 dims
+
+
+def compact_file_name(dtype: str) -> str:
+    return f"compact-{dtype}.bin"
+
+
+def _pad(f) -> None:
+    f.write(b"\0" * (-f.tell() % ALIGNMENT))
+
+
+class CompactStore:
+    """Read-only chunk vectors and texts in one memory-mapped file.
+
+    Vectors are scalar-quantized to float16, or to int8 with a per-dimension
+    offset and scale, and chunk ids, texts and metadata are stored as UTF-8
+    blobs indexed by offset arrays. Every array is a zero-copy view of the
+    mapping, so worker processes opening the same file share its pages and
+    only the parts actually read become resident.
+    """
+
+    def __init__(self, path: str, header: dict, buffer: np.ndarray):
+        self.path = path
+        self.header = header
+        self.n = header["n"]
+        self.dim = header["dim"]
+        self.dtype = header["dtype"]
+        self.stamp = header["stamp"]
+        self._buffer = buffer
+        self._inode = None
+        sections = {name: self._section(*spec) for name, spec in header["sections"].items()}
+        self.vectors = sections["vectors"].reshape(self.n, self.dim)
+        self.norms = sections["norms"]
+        self.offset = sections.get("offset")
+        self.scale = sections.get("scale")
+        self._id_offsets, self._ids = sections["id_offsets"], sections["ids"]
+        self._text_offsets, self._texts = sections["text_offsets"], sections["texts"]
+        self._meta_offsets, self._metas = sections["meta_offsets"], sections["metas"]
+
+    def _section(self, offset: int, nbytes: int, dtype: str) -> np.ndarray:
+        return self._buffer[offset:offset + nbytes].view(np.dtype(dtype))
+
+    @staticmethod
+    def _blob(offsets: np.ndarray, blob: np.ndarray, i: int) -> str:
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    @classmethod
+    def write(cls, path: str, index, ids: List[str], documents: List[Document], dtype: str, stamp: str) -> None:
+        """Write a store for a flat FAISS index and the ids/documents at each of its positions"""
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"Unknown compact dtype: {dtype}")
+        n, dim = index.ntotal, index.d
+        if n != len(documents) or n != len(ids):
+            raise ValueError(f"{n} vectors for {len(documents)} documents and {len(ids)} ids")
+
+        def blocks():
+            # Read back in blocks so the float32 vectors are never all copied at once
+            for start in range(0, n, SEARCH_BLOCK_ROWS):
+                yield index.reconstruct_n(start, min(SEARCH_BLOCK_ROWS, n - start))
+
+        offset = scale = None
+        if dtype == "int8" and n:
+            low = np.full(dim, np.inf, dtype=np.float32)
+            high = np.full(dim, -np.inf, dtype=np.float32)
+            for block in blocks():
+                low, high = np.minimum(low, block.min(axis=0)), np.maximum(high, block.max(axis=0))
+            scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255
+            offset = (low + 128 * scale).astype(np.float32)  # value = offset + code * scale, code in [-128, 127]
+
+        def quantize(block):
+            if dtype == "fp16":
+                return block.astype(np.float16)
+            return np.clip(np.rint((block - offset) / scale), -128, 127).astype(np.int8)
+
+        def dequantize(codes):
+            if dtype == "fp16":
+                return codes.astype(np.float32)
+            return offset + codes.astype(np.float32) * scale
+
+        def blob(values):
+            encoded = [value.encode("utf-8") for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            return offsets, b"".join(encoded)
+
+        id_offsets, id_blob = blob(ids)
+        text_offsets, text_blob = blob(doc.page_content for doc in documents)
+        meta_offsets, meta_blob = blob(json.dumps(doc.metadata) for doc in documents)
+
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        sections = {}
+        with open(tmp_path, "wb") as f:
+            # Placeholder header; rewritten once section offsets are known
+            header_size = 16 * 1024
+            f.write(b"\0" * header_size)
+
+            def section(name, dtype_name, parts):
+                _pad(f)
+                start = f.tell()
+                for part in parts:
+                    f.write(part)
+                sections[name] = [start, f.tell() - start, dtype_name]
+
+            section("vectors", "float16" if dtype == "fp16" else "int8",
+                    (quantize(block).tobytes() for block in blocks()))
+            # Norms of the dequantized vectors, so distances are consistent with the stored codes
+            section("norms", "float32", (
+                np.square(dequantize(quantize(block))).sum(axis=1).astype(np.float32).tobytes() for block in blocks()
+            ))
+            if dtype == "int8" and n:
+                section("offset", "float32", [offset.tobytes()])
+                section("scale", "float32", [scale.tobytes()])
+            section("id_offsets", "int64", [id_offsets.tobytes()])
+            section("ids", "uint8", [id_blob])
+            section("text_offsets", "int64", [text_offsets.tobytes()])
+            section("texts", "uint8", [text_blob])
+            section("meta_offsets", "int64", [meta_offsets.tobytes()])
+            section("metas", "uint8", [meta_blob])
+            header = json.dumps({
+                "version": FORMAT_VERSION, "n": n, "dim": dim, "dtype": dtype, "stamp": stamp, "sections": sections
+            }).encode("utf-8")
+            if len(MAGIC) + 8 + len(header) > header_size:
+                raise ValueError("Compact store header does not fit")
+            f.seek(0)
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["CompactStore"]:
+        """Map an existing store, or None if it is missing or not in this format"""
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                (length,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(length))
+            if header.get("version") != FORMAT_VERSION:
+                return None
+            inode = os.stat(path).st_ino
+            store = cls(path, header, np.memmap(path, dtype=np.uint8, mode="r"))
+            store._inode = inode
+            return store
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def chunk_id(self, i: int) -> str:
+        return self._blob(self._id_offsets, self._ids, i)
+
+    def ids(self) -> List[str]:
+        return [self.chunk_id(i) for i in range(self.n)]
+
+    def document(self, i: int) -> Document:
+        return Document(
+            page_content=self._blob(self._text_offsets, self._texts, i),
+            metadata=json.loads(self._blob(self._meta_offsets, self._metas, i))
+        )
+
+    def search(self, queries: np.ndarray, k: int):
+        """Exact L2 search over the quantized vectors; returns (distances, positions) like FAISS"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, self.n)
+        best_scores = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_positions = np.zeros((len(queries), 0), dtype=np.int64)
+        if self.dtype == "int8":
+            # q.v = q.offset + (q * scale).codes, so codes are only cast, never rescaled
+            query_offset = queries @ self.offset
+            query_scaled = queries * self.scale
+        for start in range(0, self.n, SEARCH_BLOCK_ROWS):
+            codes = self.vectors[start:start + SEARCH_BLOCK_ROWS].astype(np.float32)
+            if self.dtype == "int8":
+                dots = query_scaled @ codes.T + query_offset[:, None]
+            else:
+                dots = queries @ codes.T
+            # ||q||^2 is the same for every row, so it is left out of the ranking
+            scores = self.norms[start:start + len(codes)][None, :] - 2 * dots
+            scores = np.concatenate([best_scores, scores], axis=1)
+            positions = np.concatenate(
+                [best_positions, np.broadcast_to(np.arange(start, start + len(codes)), scores[:, -len(codes):].shape)],
+                axis=1
+            )
+            if scores.shape[1] > k:
+                keep = np.argpartition(scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                positions = np.take_along_axis(positions, keep, axis=1)
+            best_scores, best_positions = scores, positions
+        order = np.argsort(best_scores, axis=1, kind="stable")
+        distances = np.take_along_axis(best_scores, order, axis=1) + np.square(queries).sum(axis=1, keepdims=True)
+        return distances, np.take_along_axis(best_positions, order, axis=1)
+
+    def size_bytes(self) -> int:
+        # The mapping, not the path: an ingest may already have replaced the file
+        return int(self._buffer.nbytes)
+
+    def is_current(self) -> bool:
+        """False once another process has replaced (or removed) the file this store has mapped"""
+        try:
+            return os.stat(self.path).st_ino == self._inode
+        except OSError:
+            return False
+
+
+class CompactDocstore(InMemoryDocstore):
+    """Docstore reading chunks from a CompactStore instead of holding Documents in memory.
+
+    Additions and deletions made by later ingests are kept in a small overlay
+    until the next compact file is written. Pickling (FAISS.save_local)
+    produces a plain InMemoryDocstore, so the saved store does not depend on
+    the compact file.
+    """
+
+    def __init__(self, compact: CompactStore, ids: Optional[List[str]] = None):
+        super().__init__({})  # self._dict holds the overlay of added documents
+        self.compact = compact
+        self._positions: Dict[str, int] = {
+            doc_id: i for i, doc_id in enumerate(compact.ids() if ids is None else ids)
+        }
+        self._deleted = set()
+
+    @property
+    def pristine(self) -> bool:
+        """True while the store's positions still match the compact file (no ingest since it was written)"""
+        return not self._dict and not self._deleted
+
+    def copy(self) -> "CompactDocstore":
+        """Docstore over the same compact file with its own overlay"""
+        docstore = CompactDocstore(self.compact, ids=[])
+        docstore._positions = self._positions  # never modified, so it can be shared
+        docstore._dict.update(self._dict)
+        docstore._deleted = set(self._deleted)
+        return docstore
+
+    def _live_ids(self) -> List[str]:
+        return [doc_id for doc_id in self._positions if doc_id not in self._deleted] + list(self._dict)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        existing = {doc_id for doc_id in texts if doc_id in self._dict or
+                    (doc_id in self._positions and doc_id not in self._deleted)}
+        if existing:
+            raise ValueError(f"Tried to add ids that already exist: {existing}")
+        self._dict.update(texts)
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            if doc_id in self._dict:
+                del self._dict[doc_id]
+            elif doc_id in self._positions and doc_id not in self._deleted:
+                self._deleted.add(doc_id)
+            else:
+                raise ValueError(f"Tried to delete ids that does not exist: {doc_id}")
+
+    def search(self, search: str):
+        if search in self._dict:
+            return self._dict[search]
+        position = self._positions.get(search)
+        if position is None or search in self._deleted:
+            return f"ID {search} not found."
+        return self.compact.document(position)
+
+    def __reduce__(self):
+        return InMemoryDocstore, ({doc_id: self.search(doc_id) for doc_id in self._live_ids()},)
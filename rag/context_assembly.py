@@ -0,0 +1,99 @@
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from rag.chunk_stats import TOKEN_PATTERN, approx_token_count
+
+SHINGLE_SIZE = 3
+
+
+def _overlap_length(first: str, second: str, min_overlap: int) -> int:
+    """Length of the longest suffix of first that is also a prefix of second"""
+    if len(first) < min_overlap or len(second) < min_overlap:
+        return 0
+    probe = second[:min_overlap]
+    start = first.find(probe)
+    while start != -1:
+        length = len(first) - start
+        if second.startswith(first[start:]) and length >= min_overlap:
+            return length
+        start = first.find(probe, start + 1)
+    return 0
+
+
+def merge_overlapping(chunks: List[Document], min_overlap: int = 20) -> List[Document]:
+    """Join chunks from the same source whose text overlaps end-to-start, as splitter overlap produces"""
+    merged = list(chunks)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(len(merged)):
+                if i == j or merged[i].metadata.get("source") != merged[j].metadata.get("source"):
+                    continue
+                first, second = merged[i], merged[j]
+                length = _overlap_length(first.page_content, second.page_content, min_overlap)
+                if not length:
+                    continue
+                # Keep the better-ranked chunk's position in the list
+                combined = Document(
+                    page_content=first.page_content + second.page_content[length:],
+                    metadata=dict(merged[min(i, j)].metadata)
+                )
+                merged[min(i, j)] = combined
+                del merged[max(i, j)]
+                changed = True
+                break
+            if changed:
+                break
+    return merged
+
+
+def _shingles(text: str) -> set:
+    words = TOKEN_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def drop_near_duplicates(chunks: List[Document], threshold: float = 0.8) -> List[Document]:
+    """Drop chunks whose word-shingle containment in an earlier, better-ranked chunk exceeds threshold"""
+    kept, kept_shingles = [], []
+    for chunk in chunks:
+        shingles = _shingles(chunk.page_content)
+        if any(len(shingles & other) / max(len(shingles), 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def trim_to_budget(chunks: List[Document], max_tokens: int) -> List[Document]:
+    """Keep chunks in rank order until max_tokens (approximate) is reached, cutting the last one short"""
+    trimmed, used = [], 0
+    for chunk in chunks:
+        tokens = approx_token_count(chunk.page_content)
+        if used + tokens <= max_tokens:
+            trimmed.append(chunk)
+            used += tokens
+            continue
+        remaining = max_tokens - used
+        if remaining > 0:
+            matches = list(TOKEN_PATTERN.finditer(chunk.page_content))
+            cut = matches[remaining - 1].end()
+            trimmed.append(Document(page_content=chunk.page_content[:cut], metadata=dict(chunk.metadata)))
+        break
+    return trimmed
+
+
+def assemble_context(chunks: List[Document], max_tokens: Optional[int] = None,
+                     duplicate_threshold: float = 0.8) -> List[Document]:
+    """Merge overlapping chunks, drop near-duplicates and trim to the token budget"""
+    chunks = drop_near_duplicates(merge_overlapping(chunks), duplicate_threshold)
+    if max_tokens is not None:
+        chunks = trim_to_budget(chunks, max_tokens)
+    return chunks
+
+
+def count_context_tokens(chunks: List[Document]) -> int:
+    return sum(approx_token_count(chunk.page_content) for chunk in chunks)
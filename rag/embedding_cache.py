@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of another Embeddings implementation.
+
+    Vectors are keyed by a hash of the model name and the whitespace-normalized
+    text, kept in an in-memory LRU and optionally backed by a SQLite file so
+    they survive restarts. Only document vectors go to disk: questions are
+    mostly one-off, so query vectors stay in memory and cost no I/O. The
+    wrapped model is created by embeddings_factory on the first cache miss,
+    so a fully cached workload never loads it.
+    """
+
+    def __init__(self, embeddings_factory: Callable[[], Embeddings], model_name: str,
+                 cache_path: Optional[str] = None, max_entries: int = 50_000,
+                 max_disk_entries: int = 1_000_000):
+        self._embeddings_factory = embeddings_factory
+        self._embeddings = None
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0  # rows in the SQLite file, tracked so inserts need not count them
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+            (self._disk_entries,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._embeddings_factory()
+        return self._embeddings
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def _key(self, namespace: str, text: str) -> str:
+        payload = f"{self.model_name}\0{namespace}\0{self.normalize(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str], persist: bool = True) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            pending = [key for key in keys if key not in found]
+            if self._db is not None and persist and pending:
+                now = time.time()
+                # Stay well under SQLite's bound-parameter limit
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+                    if rows:
+                        self._db.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(now, key) for key, _ in rows]
+                        )
+                self._db.commit()
+        return found
+
+    def _store(self, vectors: dict, persist: bool = True) -> None:
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            if self._db is not None and persist and vectors:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(key, vector.tobytes(), now) for key, vector in vectors.items()]
+                )
+                # An upper bound (replaced rows are counted again, other processes' inserts are not),
+                # so the table is only counted once it may actually be over the limit
+                self._disk_entries += len(vectors)
+                if self._disk_entries > self.max_disk_entries:
+                    (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                    if count > self.max_disk_entries:
+                        self._db.execute(
+                            "DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                            (count - self.max_disk_entries,)
+                        )
+                    self._disk_entries = min(count, self.max_disk_entries)
+                self._db.commit()
+
+    def _embed(self, namespace: str, texts: List[str], compute) -> List[List[float]]:
+        keys = [self._key(namespace, text) for text in texts]
+        persist = namespace == "document"
+        found = self._lookup(list(dict.fromkeys(keys)), persist)
+        # Each distinct missing text is embedded once, however often it repeats
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = compute(list(missing.values()))
+            new_vectors = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), computed)
+            }
+            self._store(new_vectors, persist)
+            found.update(new_vectors)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Resolve the model lazily: fully cached calls must not trigger a load
+        return self._embed("document", texts, lambda missing: self.embeddings.embed_documents(missing))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many questions with a single embed_documents call on the wrapped model.
+
+        Shares cache entries with embed_query, which is only valid for symmetric
+        models such as MiniLM where queries and documents are encoded the same way.
+        """
+        return self._embed("query", texts, lambda missing: self.embeddings.embed_documents(missing))
+
+    def get_stats(self) -> dict:
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+        if hasattr(self._embeddings, "get_stats"):
+            stats["backend"] = self._embeddings.get_stats()
+        return stats
@@ -0,0 +1,309 @@
+"""Embedding model shared by every worker process, served over a Unix socket.
+
+One service process loads the model; workers use EmbeddingClient instead of
+loading their own copy. Concurrent requests are encoded together in small
+batches. Start it by hand, or let the first worker start it (see
+ensure_embedding_service):
+
+    python -m rag.embedding_service --socket /tmp/rag-embeddings.sock
+"""
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import logging
+import argparse
+import threading
+import subprocess
+import socketserver
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.file_lock import file_lock
+
+FRAME_HEADER = struct.Struct("<Q")
+CONNECT_ATTEMPTS = 6  # backoff of 10, 20, ... 160 ms between attempts
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if not n:
+            raise ConnectionError("Embedding service connection closed")
+        received += n
+    return bytes(buffer)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class _Batcher:
+    """Collects texts from concurrent requests and encodes them in one model call"""
+
+    def __init__(self, embeddings: Embeddings, max_batch: int, max_wait: float):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                size += len(pending[-1][0])
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.seconds += time.perf_counter() - start
+            self.requests += len(pending)
+            self.texts += len(texts)
+            self.batches += 1
+            offset = 0
+            for request_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "texts_per_batch": self.texts / self.batches if self.batches else 0.0,
+            "encode_seconds": self.seconds,
+        }
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves embed requests on a Unix socket, one thread per connected worker.
+
+    Each request is a length-prefixed JSON frame, {"texts": [...]} or
+    {"op": "stats"}. Embeddings are answered with a JSON header frame
+    ({"shape": [n, d]}) followed by a frame of raw float32 bytes.
+    """
+
+    daemon_threads = True
+    # Every worker thread holds a connection; a burst of reconnects must not overflow the backlog
+    request_queue_size = 128
+
+    def __init__(self, embeddings: Embeddings, socket_path: str, max_batch: int = 64, max_wait: float = 0.002):
+        if os.path.exists(socket_path):
+            # Left behind by a service that did not shut down cleanly
+            os.unlink(socket_path)
+        self.batcher = _Batcher(embeddings, max_batch, max_wait)
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            while True:
+                self._respond(json.loads(_recv_frame(self.request)))
+        except OSError:
+            # The worker closed its connection (ConnectionError, BrokenPipeError, ...)
+            return
+
+    def _respond(self, request: dict) -> None:
+        try:
+            if request.get("op") == "stats":
+                _send_frame(self.request, json.dumps(self.server.batcher.get_stats()).encode("utf-8"))
+                return
+            vectors = self.server.batcher.submit(request["texts"]).result()
+        except OSError:
+            raise
+        except Exception as e:
+            logging.error(f"Embedding request failed: {str(e)}")
+            _send_frame(self.request, json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+        _send_frame(self.request, json.dumps({"shape": list(vectors.shape)}).encode("utf-8"))
+        _send_frame(self.request, vectors.tobytes())
+
+
+class EmbeddingClient(Embeddings):
+    """Embeddings computed by the shared EmbeddingServer.
+
+    Each thread keeps its own connection, reconnecting once if the service
+    was restarted. Queries are encoded like documents, which is what the
+    service's symmetric model (MiniLM) does anyway.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.requests = 0
+        self.texts = 0
+        self.seconds = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            for attempt in range(CONNECT_ATTEMPTS):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.socket_path)
+                    break
+                except (BlockingIOError, ConnectionRefusedError):
+                    # The accept backlog is full (a timeout makes AF_UNIX connect non-blocking,
+                    # so that shows up as EAGAIN) or the service is still binding: back off
+                    sock.close()
+                    if attempt == CONNECT_ATTEMPTS - 1:
+                        raise
+                    time.sleep(0.01 * 2 ** attempt)
+                except OSError:
+                    sock.close()
+                    raise
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _call(self, request: dict) -> Tuple[dict, Optional[bytes]]:
+        payload = json.dumps(request).encode("utf-8")
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                _send_frame(sock, payload)
+                header = json.loads(_recv_frame(sock))
+                body = _recv_frame(sock) if "shape" in header else None
+                break
+            except OSError as e:
+                # A half-read reply would desynchronize the connection, so always drop it;
+                # retry once if the service went away, but never resend after a timeout
+                self._close()
+                if attempt or isinstance(e, socket.timeout):
+                    raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return header, body
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        header, body = self._call({"texts": list(texts)})
+        vectors = np.frombuffer(body, dtype=np.float32).reshape(header["shape"])
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+            self.seconds += time.perf_counter() - start
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def ping(self) -> bool:
+        try:
+            self._call({"op": "stats"})
+            return True
+        except OSError:
+            return False
+
+    def get_stats(self) -> dict:
+        return {
+            "socket": self.socket_path,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_request_ms": 1000 * self.seconds / self.requests if self.requests else 0.0,
+        }
+
+
+def ensure_embedding_service(socket_path: str, model_name: str, startup_timeout: float = 120.0) -> EmbeddingClient:
+    """Client for the service on socket_path, starting the service first if nothing answers there.
+
+    A lock next to the socket makes sure concurrently starting workers launch
+    only one service; it is detached, so it outlives the worker that started it.
+    """
+    client = EmbeddingClient(socket_path)
+    if client.ping():
+        return client
+    with file_lock(f"{socket_path}.lock"):
+        if client.ping():
+            return client
+        log_path = f"{socket_path}.log"
+        with open(log_path, "ab") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "rag.embedding_service", "--socket", socket_path, "--model", model_name],
+                cwd=PACKAGE_ROOT, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        deadline = time.monotonic() + startup_timeout
+        while not client.ping():
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Embedding service did not start on {socket_path}; see {log_path}")
+            time.sleep(0.2)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings to local worker processes")
+    parser.add_argument("--socket", default=os.getenv("RAG_EMBEDDING_SOCKET", "/tmp/rag-embeddings.sock"))
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--max-batch", type=int, default=64, help="texts encoded per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long to wait for a batch to fill")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if EmbeddingClient(args.socket).ping():
+        sys.exit(f"An embedding service is already running on {args.socket}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(model_name=args.model)
+    embeddings.embed_documents(["warm up"])
+    with EmbeddingServer(embeddings, args.socket, args.max_batch, args.max_wait_ms / 1000) as server:
+        logging.info(f"Serving {args.model} embeddings on {args.socket}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
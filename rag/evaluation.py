@@ -0,0 +1,225 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from rag.PromptGenerator import PROMPTING_METHODS
+from rag.chunk_stats import approx_token_count
+
+# Define evaluation questions and reference answers
+EVAL_SET = [
+    {
+        'question': "What is quantum computing and how does it differ from classical computing?",
+        'reference': "Quantum computing uses qubits that can exist in multiple states simultaneously, leveraging superposition and entanglement, unlike classical computers that use bits (0 or 1). This allows quantum computers to solve certain problems much faster than classical computers."
+    },
+    {
+        'question': "What are qubits, superposition, and entanglement in quantum computing?",
+        'reference': "Qubits are quantum bits that can represent both 0 and 1 at the same time (superposition). Entanglement is a property where qubits become linked and the state of one affects the other, enabling powerful quantum computations."
+    },
+    {
+        'question': "How could quantum computing impact cryptography and data security?",
+        'reference': "Quantum computers can break current encryption methods like RSA by factoring large numbers efficiently, which threatens data security. This drives research into quantum-resistant cryptography."
+    },
+    {
+        'question': "What are some real-world applications of quantum computing?",
+        'reference': "Quantum computing can be used in cryptography, optimization, drug discovery, materials science, and complex simulations that are difficult for classical computers."
+    },
+    {
+        'question': "What are the main challenges and future trends in quantum computing?",
+        'reference': "Challenges include scalability, error correction, and stability of qubits. Future trends involve overcoming these barriers, developing quantum-safe cryptography, and expanding applications in various fields."
+    }
+]
+
+# Helper: simple tokenization for F1
+TOKENIZER = re.compile(r'\w+')
+def tokenize(text):
+    return TOKENIZER.findall(text.lower())
+
+def compute_f1(prediction, reference):
+    pred_tokens = tokenize(prediction)
+    ref_tokens = tokenize(reference)
+    common = set(pred_tokens) & set(ref_tokens)
+    if not common:
+        return 0.0
+    precision = len(common) / len(pred_tokens) if pred_tokens else 0
+    recall = len(common) / len(ref_tokens) if ref_tokens else 0
+    if precision + recall == 0:
+        return 0.0
+    return 2 * (precision * recall) / (precision + recall)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class RateLimiter:
+    """Spaces calls at least 1 / rate seconds apart across threads; rate=None disables it"""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class EvaluationRunner:
+    """Sweeps chunking methods x prompting methods over an evaluation set.
+
+    Questions run concurrently on a thread pool, with LLM calls spaced by an
+    optional rate limit. Every finished question is appended to a JSONL
+    checkpoint, and a rerun with the same checkpoint only executes what is
+    missing or previously failed.
+    """
+
+    def __init__(self, rag_system, eval_set: Optional[List[dict]] = None, methods: Optional[List[str]] = None,
+                 prompt_methods: Optional[List[str]] = None, workers: int = 8, rate_limit: Optional[float] = None,
+                 checkpoint_path: Optional[str] = None):
+        self.rag_system = rag_system
+        self.eval_set = eval_set or EVAL_SET
+        self.methods = self._check_names("chunking", methods, list(rag_system.vector_stores))
+        self.prompt_methods = self._check_names("prompting", prompt_methods, list(PROMPTING_METHODS))
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint_lock = threading.Lock()
+
+    @staticmethod
+    def _check_names(kind: str, names: Optional[List[str]], known: List[str]) -> List[str]:
+        """names, or all of known when None; an empty or unknown selection raises ValueError before any LLM call"""
+        if names is None:
+            return known
+        names = list(names)
+        if not names:
+            raise ValueError(f"No {kind} methods selected")
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ValueError(f"Unknown {kind} methods: {', '.join(unknown)} (available: {', '.join(known)})")
+        return names
+
+    @staticmethod
+    def _record_key(record: dict) -> tuple:
+        return record["method"], record["prompt_method"], record["question"]
+
+    def load_checkpoint(self) -> Dict[tuple, dict]:
+        """Successful records from an earlier run, keyed by (method, prompt_method, question)"""
+        records = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if not record.get("error"):
+                records[self._record_key(record)] = record
+        if lines and not lines[-1].endswith("\n"):
+            # Terminate the cut-off line so appended records start on a line of their own
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        return records
+
+    def _checkpoint(self, record: dict) -> None:
+        if not self.checkpoint_path:
+            return
+        with self._checkpoint_lock:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+
+    def _evaluate(self, method: str, prompt_method: str, item: dict, source_documents) -> dict:
+        self.rate_limiter.wait()
+        start = time.perf_counter()
+        result = self.rag_system.query_with_method(
+            question=item['question'],
+            method_name=method,
+            prompt_method=prompt_method,
+            source_documents=source_documents
+        )
+        latency = time.perf_counter() - start
+        answer = result.get('answer', '')
+        return {
+            "method": method,
+            "prompt_method": prompt_method,
+            "question": item['question'],
+            "answer": answer,
+            "f1": compute_f1(answer, item['reference']),
+            "latency_seconds": latency,
+            "context_tokens": result.get('context_tokens', 0),
+            "answer_tokens": approx_token_count(answer),
+            "cached": result.get('cached', False),
+            "error": result.get('error')
+        }
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+        """Evaluate every missing (method, prompt_method, question); returns all records, old and new"""
+        grid = {(m, p, item['question']) for m in self.methods for p in self.prompt_methods for item in self.eval_set}
+        done = {key: record for key, record in self.load_checkpoint().items() if key in grid}
+        questions = [item['question'] for item in self.eval_set]
+        pending = []
+        for method in self.methods:
+            items = [item for item in self.eval_set
+                     if any((method, p, item['question']) not in done for p in self.prompt_methods)]
+            if not items:
+                continue
+            # Retrieval doesn't depend on the prompt, so do it once per method in a vectorized pass
+            retrieved = dict(zip(questions, self.rag_system.retrieve_batch(questions, method)))
+            for prompt_method in self.prompt_methods:
+                for item in items:
+                    if (method, prompt_method, item['question']) not in done:
+                        pending.append((method, prompt_method, item, retrieved[item['question']]))
+        total = len(done) + len(pending)
+        logging.info(f"Evaluation: {len(done)} results from checkpoint, {len(pending)} to run")
+        records = list(done.values())
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-eval") as executor:
+            futures = [executor.submit(self._evaluate, *task) for task in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                self._checkpoint(record)
+                records.append(record)
+                if progress:
+                    progress(len(records), total)
+        return records
+
+    def summarize(self, records: List[dict]) -> List[dict]:
+        """One row per (method, prompt_method): mean F1, latency percentiles and token counts"""
+        groups = {}
+        for record in records:
+            groups.setdefault((record["method"], record["prompt_method"]), []).append(record)
+        rows = []
+        for (method, prompt_method), group in sorted(groups.items()):
+            ok = [record for record in group if not record.get("error")]
+            latencies = [record["latency_seconds"] for record in ok]
+            rows.append({
+                "method": method,
+                "prompt_method": prompt_method,
+                "questions": len(group),
+                "errors": len(group) - len(ok),
+                "f1": sum(record["f1"] for record in ok) / len(ok) if ok else 0.0,
+                "latency_p50": percentile(latencies, 50),
+                "latency_p95": percentile(latencies, 95),
+                "context_tokens": sum(record["context_tokens"] for record in ok),
+                "answer_tokens": sum(record["answer_tokens"] for record in ok),
+            })
+        return sorted(rows, key=lambda row: row["f1"], reverse=True)
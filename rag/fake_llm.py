@@ -0,0 +1,134 @@
+import re
+import math
+import time
+import random
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+[.!?]?")
+WORD_PATTERN = re.compile(r"\w+")
+PIECE_PATTERN = re.compile(r"\S+\s*")
+# Words every template or question uses; matching on them says nothing about relevance
+PROMPT_WORDS = {
+    "question", "answer", "context", "following", "provide", "based", "what", "which", "that", "this",
+    "the", "and", "are", "for", "how", "why", "who", "was", "has", "its", "can", "you", "does", "with",
+}
+
+
+@lru_cache(maxsize=1)
+def _template_sentences() -> frozenset:
+    """Sentences of the prompt templates themselves, which are never part of an answer"""
+    from rag.PromptGenerator import PromptGenerator, PROMPTING_METHODS
+    return frozenset(
+        sentence.strip() for method in PROMPTING_METHODS
+        for sentence in SENTENCE_PATTERN.findall(PromptGenerator.get_template(method)) if sentence.strip()
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline stand-in for the Groq chat model.
+
+    The answer is a deterministic extract of the retrieved context (the text
+    between the last "Context:" and "Question:" markers, minus any template
+    sentences): the sentences sharing the most words with the question.
+    Time to first token is drawn from latency_distribution around latency
+    seconds, seeded by the prompt so reruns see the same delays, and tokens
+    are then emitted at tokens_per_second (0 means all at once).
+    """
+
+    latency: float = 0.0
+    latency_distribution: str = "fixed"
+    latency_sigma: float = 0.5  # lognormal only
+    tokens_per_second: float = 0.0
+    answer_sentences: int = 2
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    @staticmethod
+    def _content_words(text: str) -> set:
+        return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 2 and word not in PROMPT_WORDS}
+
+    @staticmethod
+    def _sentences(text: str) -> List[str]:
+        return [s.strip() for s in SENTENCE_PATTERN.findall(text) if s.strip()]
+
+    def answer_for(self, prompt: str) -> str:
+        context, _, question = prompt.rpartition("Question:")
+        # Every template puts the retrieved chunks right after its last "Context:" marker
+        _, marker, retrieved = context.rpartition("Context:")
+        if marker:
+            context = retrieved
+        question_words = self._content_words(question)
+        sentences = [s for s in self._sentences(context) if s not in _template_sentences()]
+        if not sentences:
+            return "I don't know."
+        # Highest overlap first; earlier sentences win ties
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(question_words & self._content_words(sentences[i])), i)
+        )
+        chosen = sorted(ranked[:self.answer_sentences])
+        return " ".join(sentences[i] for i in chosen)
+
+    def sample_latency(self, prompt: str) -> float:
+        if self.latency <= 0:
+            return 0.0
+        digest = hashlib.sha1(f"{self.seed}\0{prompt}".encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "lognormal":
+            # Parameterized so the mean stays at self.latency
+            return rng.lognormvariate(math.log(self.latency) - self.latency_sigma ** 2 / 2, self.latency_sigma)
+        return self.latency
+
+    def _pieces(self, answer: str) -> List[str]:
+        return PIECE_PATTERN.findall(answer) or [answer]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        pieces = [chunk.message.content async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(pieces)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        time.sleep(self.sample_latency(prompt))
+        for piece in self._pieces(self.answer_for(prompt)):
+            if self.tokens_per_second > 0:
+                time.sleep(1.0 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        await asyncio.sleep(self.sample_latency(prompt))
+        for piece in self._pieces(self.answer_for(prompt)):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1.0 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
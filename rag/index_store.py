@@ -0,0 +1,192 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+MANIFEST_FILE = "manifest.json"
+CACHE_VERSION = 2  # bump when the on-disk layout changes
+
+
+class LazyIndex:
+    """Stand-in for a saved flat FAISS index that is only read from disk when first used.
+
+    FAISS copies flat indexes into RAM even when asked to memory-map them, so
+    stores served from a compact file keep their float32 index behind this
+    proxy; ingestion loads it on its first add/remove. Shape attributes are
+    answered without loading.
+    """
+
+    def __init__(self, path: str, ntotal: int, d: int, metric_type: int):
+        self._index = None
+        self._lock = threading.Lock()
+        self._ntotal = ntotal
+        self.path = path
+        self.d = d
+        self.metric_type = metric_type
+
+    @property
+    def ntotal(self) -> int:
+        return self._index.ntotal if self._index is not None else self._ntotal
+
+    def load(self):
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.read_index(self.path)
+            return self._index
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+class IndexStore:
+    """Persistent cache of FAISS vector stores, one directory per cache key"""
+
+    def __init__(self, cache_dir: str = ".index_cache"):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """SHA-256 of the file contents"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def splitter_fingerprint(splitter) -> dict:
+        """JSON-safe description of a text splitter's configuration"""
+        params = {}
+        for name, value in sorted(vars(splitter).items()):
+            if callable(value):
+                value = getattr(value, "__qualname__", repr(value))
+            elif not isinstance(value, (str, int, float, bool, list, tuple, type(None))):
+                value = repr(value)
+            params[name] = value
+        return {"class": type(splitter).__name__, "params": params}
+
+    def make_key(self, source_id: str, splitter, model_name: str) -> str:
+        """Cache key covering the corpus identity, splitter config and embedding model.
+
+        Changes to individual documents are tracked by the manifest stored with
+        each entry, so they update the entry in place rather than changing the key.
+        """
+        payload = json.dumps({
+            "version": CACHE_VERSION,
+            "source": source_id,
+            "splitter": self.splitter_fingerprint(splitter),
+            "model": model_name,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def entry_path(self, method_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, method_name, key)
+
+    def load(self, method_name: str, key: str, embeddings) -> Optional[FAISS]:
+        """Return the cached store for (method_name, key), or None on a miss"""
+        path = self.entry_path(method_name, key)
+        index_path = os.path.join(path, INDEX_FILE)
+        docstore_path = os.path.join(path, DOCSTORE_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(docstore_path)):
+            return None
+        try:
+            # Memory-map the index so restarts don't copy the vectors into RAM up front
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            with open(docstore_path, "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable index cache {path}: {str(e)}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def load_manifest(self, method_name: str, key: str) -> dict:
+        """Ingestion manifest saved alongside the store, or {} if there is none"""
+        try:
+            with open(os.path.join(self.entry_path(method_name, key), MANIFEST_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, method_name: str, key: str, vector_store: FAISS, manifest: Optional[dict] = None) -> bool:
+        """Persist vector_store (and its manifest) under key and drop stale entries for the same method.
+
+        Returns False if the entry could not be written.
+        """
+        path = self.entry_path(method_name, key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        if isinstance(vector_store.index, LazyIndex):
+            # faiss.write_index needs the real index object
+            vector_store.index = vector_store.index.load()
+        try:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            vector_store.save_local(tmp_path)
+            if manifest is not None:
+                with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+            self.prune(method_name, keep=key)
+            return True
+        except OSError as e:
+            # A read-only or full disk only costs us the cache, not the build
+            logging.warning(f"Could not persist index cache {path}: {str(e)}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+    def load_compact(self, method_name: str, key: str, embeddings, dtype: str) -> Optional[FAISS]:
+        """Cached store whose chunks are served from the entry's compact file, or None if it has none.
+
+        Neither the pickled docstore nor the float32 vectors are read, so chunk
+        texts and vectors are not copied into RAM.
+        """
+        from rag.compact_store import CompactStore, CompactDocstore, compact_file_name
+        path = self.entry_path(method_name, key)
+        compact = CompactStore.open(os.path.join(path, compact_file_name(dtype)))
+        if compact is None:
+            return None
+        index_path = os.path.join(path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        # The compact file is written into the entry after the index, so it describes the same
+        # vectors; it is what queries search, and the float32 index is only read for ingestion
+        index = LazyIndex(index_path, compact.n, compact.dim, faiss.METRIC_L2)
+        ids = compact.ids()
+        return FAISS(embeddings, index, CompactDocstore(compact, ids), dict(enumerate(ids)))
+
+    def save_compact(self, method_name: str, key: str, vector_store: FAISS, dtype: str) -> Optional[FAISS]:
+        """Write the compact file for a store already saved under key, and return the store re-opened from it"""
+        from rag.ann_index import content_stamp
+        from rag.compact_store import CompactStore, compact_file_name
+        index = vector_store.index
+        if index.metric_type != faiss.METRIC_L2:
+            logging.warning(f"Compact storage only supports L2 indexes; keeping {method_name} in float32")
+            return None
+        ids = [vector_store.index_to_docstore_id[i] for i in range(index.ntotal)]
+        documents = [vector_store.docstore.search(doc_id) for doc_id in ids]
+        path = os.path.join(self.entry_path(method_name, key), compact_file_name(dtype))
+        try:
+            CompactStore.write(path, index, ids, documents, dtype, content_stamp(vector_store.index_to_docstore_id))
+        except OSError as e:
+            logging.warning(f"Could not write compact store {path}: {str(e)}")
+            return None
+        return self.load_compact(method_name, key, vector_store.embedding_function, dtype)
+
+    def prune(self, method_name: str, keep: str) -> None:
+        method_dir = os.path.join(self.cache_dir, method_name)
+        for entry in os.listdir(method_dir):
+            # Leave in-progress writes from other processes alone
+            if entry != keep and ".tmp-" not in entry:
+                shutil.rmtree(os.path.join(method_dir, entry), ignore_errors=True)
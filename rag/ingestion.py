@@ -0,0 +1,216 @@
+import os
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List
+
+from langchain_core.documents import Document
+from langchain_community.document_loaders import TextLoader
+from langchain_community.vectorstores import FAISS
+
+from rag.index_store import IndexStore, LazyIndex
+
+SUPPORTED_EXTENSIONS = (".txt", ".md")
+
+
+def iter_source_paths(sources: Iterable[str]) -> Iterator[str]:
+    """Expand files and directories into individual document paths, in a stable order"""
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield source
+
+
+class IngestionPipeline:
+    """Keeps one FAISS store per chunking method in sync with a set of source files.
+
+    Each method has a manifest recording, per document path, the file's
+    fingerprint and the IDs of the chunks it contributed. Only new or changed
+    files are loaded, split and embedded; their previous chunks are deleted
+    from the store first, and files that disappeared are removed.
+
+    Stores passed in are never modified: a method whose chunks change gets an
+    updated copy in vector_stores, so queries can keep searching the original
+    until the caller swaps the copy in.
+    """
+
+    def __init__(self, chunking_methods: dict, embeddings, batch_size: int = 256):
+        self.chunking_methods = chunking_methods
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _stat(path: str) -> dict:
+        stat = os.stat(path)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _changed_documents(self, paths: Iterable[str], manifests: dict, vector_stores: dict,
+                           seen: set, missing: set, summary: dict) -> Iterator[tuple]:
+        """Yield (path, fingerprint, documents) for every path whose indexed chunks are out of date.
+
+        A file that no longer exists is added to missing, so its chunks are
+        removed. A file that cannot be read is logged and skipped, keeping
+        whatever was indexed for it before.
+        """
+        for path in paths:
+            if path in seen or path in missing:
+                continue
+            try:
+                stat = self._stat(path)
+            except FileNotFoundError:
+                missing.add(path)
+                continue
+            except OSError as e:
+                logging.error(f"Skipping {path}: {str(e)}")
+                summary["failed"] += 1
+                continue
+            seen.add(path)
+            entries = [manifests[m]["documents"].get(path) for m in self.chunking_methods]
+            indexed = all(entries) and all(m in vector_stores for m in self.chunking_methods)
+            # Identical mtime and size: trust the stored hash instead of re-reading the file
+            if indexed and all(entry["stat"] == stat for entry in entries):
+                summary["unchanged"] += 1
+                continue
+            try:
+                file_hash = IndexStore.file_hash(path)
+                fingerprint = {"hash": file_hash, "stat": stat}
+                if indexed and all(entry["hash"] == file_hash for entry in entries):
+                    for entry in entries:
+                        entry["stat"] = stat
+                    summary["unchanged"] += 1
+                    continue
+                documents = TextLoader(path).load()
+            except Exception as e:
+                # e.g. TextLoader's RuntimeError for a file that is not valid UTF-8
+                logging.error(f"Skipping {path}: {str(e)}")
+                summary["failed"] += 1
+                continue
+            summary["updated" if any(entries) else "added"] += 1
+            yield path, fingerprint, documents
+
+    @staticmethod
+    def _copy_store(vector_store: FAISS) -> FAISS:
+        """Independent copy of vector_store to apply deletes and additions to"""
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from rag.compact_store import CompactDocstore
+        index = vector_store.index
+        # A LazyIndex has nothing in memory to copy; read the saved index instead of pinning it
+        index = faiss.read_index(index.path) if isinstance(index, LazyIndex) else faiss.clone_index(index)
+        docstore = vector_store.docstore
+        if isinstance(docstore, CompactDocstore):
+            docstore = docstore.copy()
+        else:
+            docstore = InMemoryDocstore(dict(docstore._dict))
+        return FAISS(
+            vector_store.embedding_function, index, docstore, dict(vector_store.index_to_docstore_id),
+            normalize_L2=vector_store._normalize_L2, distance_strategy=vector_store.distance_strategy
+        )
+
+    @staticmethod
+    def _chunks(path: str, documents: List[Document], splitter) -> Iterator[Document]:
+        seen_ids = {}
+        for chunk in splitter.split_documents(documents):
+            digest = hashlib.sha1(f"{path}\0{chunk.page_content}".encode("utf-8")).hexdigest()[:16]
+            # Repeated passages inside one file still need distinct docstore IDs
+            count = seen_ids.get(digest, 0)
+            seen_ids[digest] = count + 1
+            chunk.metadata["chunk_id"] = digest if count == 0 else f"{digest}-{count}"
+            yield chunk
+
+    def _flush(self, method_name: str, vector_stores: dict, deletes: List[str],
+               additions: List[Document], pending: dict, manifest: dict, summary: dict) -> None:
+        """Apply queued deletes and additions, then record the affected files in the manifest.
+
+        pending maps path -> manifest entry (None for a removed file). Entries
+        are only written once the store holds their chunks; if adding fails the
+        files are dropped from the manifest, so the next ingest indexes them again.
+        """
+        vector_store = vector_stores.get(method_name)
+        if vector_store is not None and (deletes or additions):
+            existing = set(vector_store.index_to_docstore_id.values())
+            # Chunks left behind by an earlier ingest that failed before its manifest was written
+            stale = (chunk.metadata["chunk_id"] for chunk in additions)
+            ids = [i for i in dict.fromkeys([*deletes, *stale]) if i in existing]
+            if ids:
+                vector_store.delete(ids)
+        deletes.clear()
+        try:
+            for start in range(0, len(additions), self.batch_size):
+                batch = additions[start:start + self.batch_size]
+                ids = [chunk.metadata["chunk_id"] for chunk in batch]
+                if vector_store is None:
+                    vector_store = FAISS.from_documents(batch, self.embeddings, ids=ids)
+                    vector_stores[method_name] = vector_store
+                else:
+                    vector_store.add_documents(batch, ids=ids)
+                summary["chunks_embedded"] += len(batch)
+        except Exception:
+            # Their previous chunks are already deleted, so forget these files entirely
+            for path in pending:
+                manifest.pop(path, None)
+            pending.clear()
+            raise
+        finally:
+            additions.clear()
+        for path, entry in pending.items():
+            if entry is None:
+                manifest.pop(path, None)
+            else:
+                manifest[path] = entry
+        pending.clear()
+
+    def ingest(self, sources: Iterable[str], vector_stores: Dict[str, FAISS], manifests: Dict[str, dict],
+               remove_missing: bool = True) -> dict:
+        """Update manifests in place and put updated stores in vector_stores; returns counts of what changed"""
+        summary = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0, "chunks_embedded": 0}
+        for method_name in self.chunking_methods:
+            manifests.setdefault(method_name, {}).setdefault("documents", {})
+        deletes = {method_name: [] for method_name in self.chunking_methods}
+        additions = {method_name: [] for method_name in self.chunking_methods}
+        # Manifest changes waiting for their chunks to reach the store; dropped if ingestion fails
+        pending = {method_name: {} for method_name in self.chunking_methods}
+
+        copied = set()
+
+        def flush(method_name):
+            if method_name in vector_stores and method_name not in copied and \
+                    (deletes[method_name] or additions[method_name]):
+                vector_stores[method_name] = self._copy_store(vector_stores[method_name])
+                copied.add(method_name)
+            self._flush(method_name, vector_stores, deletes[method_name], additions[method_name],
+                        pending[method_name], manifests[method_name]["documents"], summary)
+
+        seen, missing = set(), set()
+        changed = self._changed_documents(
+            iter_source_paths(sources), manifests, vector_stores, seen, missing, summary
+        )
+        for path, fingerprint, documents in changed:
+            fingerprint["chars"] = sum(len(document.page_content) for document in documents)
+            for method_name, splitter in self.chunking_methods.items():
+                previous = manifests[method_name]["documents"].get(path)
+                if previous:
+                    deletes[method_name].extend(previous["ids"])
+                chunks = list(self._chunks(path, documents, splitter))
+                pending[method_name][path] = dict(fingerprint, ids=[c.metadata["chunk_id"] for c in chunks])
+                additions[method_name].extend(chunks)
+                # Embed in bounded batches rather than holding the whole corpus in memory
+                if len(additions[method_name]) >= self.batch_size:
+                    flush(method_name)
+        # Deleted files are dropped even from a partial ingest; a full sync also drops unlisted ones
+        removed = set()
+        for method_name in self.chunking_methods:
+            documents_manifest = manifests[method_name]["documents"]
+            for path in [p for p in documents_manifest if p in missing or (remove_missing and p not in seen)]:
+                deletes[method_name].extend(documents_manifest[path]["ids"])
+                pending[method_name][path] = None
+                removed.add(path)
+        summary["removed"] = len(removed)
+        for method_name in self.chunking_methods:
+            flush(method_name)
+        logging.info(f"Ingestion finished: {summary}")
+        return summary
@@ -0,0 +1,168 @@
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+
+# Seconds; spans cover everything from a BM25 lookup to a full LLM call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "min", "max")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation,
+        narrowed to the observed min and max"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = max(self.bounds[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """In-process stage timings and counters, rendered in Prometheus text format.
+
+    span(stage) times a block into the rag_stage_seconds histogram; inc()
+    bumps a labelled counter. With enabled=False both are near no-ops.
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = "rag"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def span(self, stage: str):
+        return _Span(self, stage) if self.enabled else NULL_SPAN
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def summary(self) -> dict:
+        """Per-stage count, mean and estimated p50/p95 in milliseconds, plus counter totals"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": 1000 * h.sum / h.count if h.count else 0.0,
+                    "p50_ms": 1000 * h.quantile(0.5),
+                    "p95_ms": 1000 * h.quantile(0.95),
+                }
+                for stage, h in sorted(self.stages.items())
+            }
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                label_text = ",".join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label_text}}}" if labels else name] = value
+        return {"stages": stages, "counters": counters}
+
+    @staticmethod
+    def _labels(labels) -> str:
+        if not labels:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Text exposition format; gauges adds point-in-time values such as cache sizes"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(h.bounds + (float("inf"),), h.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+            typed = set()
+            for (counter, labels), value in sorted(self.counters.items()):
+                full_name = f"{self.prefix}_{counter}_total"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} counter")
+                    typed.add(full_name)
+                lines.append(f"{full_name}{self._labels(labels)} {value}")
+        for gauge, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            lines.append(f"{self.prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; RAG_METRICS=0 turns instrumentation off
+metrics = Metrics(enabled=os.getenv("RAG_METRICS", "1").lower() not in ("0", "false", "no"))
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Set in each worker process by _init_worker
+_worker_model = None
+_worker_encode_kwargs = {}
+
+
+def _init_worker(model_name: str, threads_per_worker: int, encode_kwargs: dict) -> None:
+    global _worker_model, _worker_encode_kwargs
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Each worker gets a fixed slice of the cores instead of every worker claiming all of them
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+    _worker_encode_kwargs = encode_kwargs
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    vectors = _worker_model.encode(texts, show_progress_bar=False, convert_to_numpy=True, **_worker_encode_kwargs)
+    return vectors.astype(np.float32, copy=False)
+
+
+class ParallelEmbeddings(Embeddings):
+    """Sentence-transformers embeddings sharded across a pool of worker processes.
+
+    Texts are split into batches of batch_size and encoded by workers that each
+    load their own copy of the model with threads_per_worker torch threads.
+    Results are returned in input order.
+    """
+
+    def __init__(self, model_name: str, workers: Optional[int] = None, batch_size: int = 64,
+                 threads_per_worker: int = 1, encode_kwargs: Optional[dict] = None):
+        self.model_name = model_name
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker
+        self.encode_kwargs = encode_kwargs or {}
+        self.chunks_embedded = 0
+        self.seconds = 0.0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # fork after torch has started its thread pools can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.threads_per_worker, self.encode_kwargs)
+                )
+            return self._pool
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        # Executor.map yields results in submission order, whichever worker finishes first
+        vectors = np.concatenate(list(self._get_pool().map(_encode_batch, batches)))
+        with self._lock:
+            self.chunks_embedded += len(texts)
+            self.seconds += time.perf_counter() - start
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "threads_per_worker": self.threads_per_worker,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_per_sec": self.chunks_embedded / self.seconds if self.seconds else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
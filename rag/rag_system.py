@@ -1,36 +1,123 @@
 import os
+import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from dotenv import load_dotenv
-from langchain_community.document_loaders import TextLoader
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA # custom prompt templates for the language model
-from langchain.prompts import PromptTemplate
-from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter # sentence_splitter
-from rag.PromptGenerator import PromptGenerator, PROMPTING_METHODS
+from rag.PromptGenerator import PromptGenerator, PROMPTING_METHODS, DEFAULT_PROMPT_TOKEN_BUDGET
+from rag.metrics import metrics
+
+# langchain, FAISS, numpy and the model backends are imported where they are first
+# needed, so importing this module (or rag.PromptGenerator) stays cheap.
 
 load_dotenv() # load environment variables
 
 class RAGSystem:
-    def __init__(self):
+    def __init__(self, index_cache_dir=None, compare_workers=None, compare_timeout=None,
+                 answer_cache_mode=None, answer_cache_backend=None, document_paths=None,
+                 embedding_workers=None, retrieval_mode=None, index_configs=None,
+                 context_budgets=None, llm_timeout=None, llm_concurrency=None, llm_backend=None,
+                 vector_storage=None, embedding_socket=None, rerank_configs=None):
+        # "groq" calls the hosted model; "fake" is an offline stand-in for benchmarks and tests
+        self.llm_backend = llm_backend or os.getenv("RAG_LLM_BACKEND", "groq")
+        if self.llm_backend not in ("groq", "fake"):
+            raise ValueError(f"Unknown LLM backend: {self.llm_backend}")
         self.groq_api_key = os.getenv("GROQ_API_KEY")
-        if not self.groq_api_key:
+        if self.llm_backend == "groq" and not self.groq_api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.llm = ChatGroq(
-            api_key=self.groq_api_key,
-            model="deepseek-r1-distill-llama-70b",
-            temperature=0,  #Ensures deterministic output (no randomness).
-            max_tokens=None,
-            reasoning_format="parsed",
-            timeout=None,
-            max_retries=2,
+        from rag.index_store import IndexStore
+        from rag.embedding_cache import CachedEmbeddings
+        from rag.ingestion import IngestionPipeline
+        from rag.single_flight import SingleFlight
+        self._llm = None  # created on first use, see the llm property
+        self._llm_lock = threading.Lock()
+        # Seconds before an LLM request is abandoned, and how many may be in flight at once
+        self.llm_timeout = float(llm_timeout or os.getenv("RAG_LLM_TIMEOUT", "60"))
+        self.llm_concurrency = int(llm_concurrency or os.getenv("RAG_LLM_CONCURRENCY", "16"))
+        self.llm_model = os.getenv("RAG_LLM_MODEL", "deepseek-r1-distill-llama-70b")
+        if self.llm_backend == "fake":
+            self.llm_model = "fake"
+        self._llm_semaphore = None  # asyncio.Semaphore, created on the serving event loop
+        self.embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+        self.document_path = "sample_document.txt"
+        # Files and/or directories making up the corpus, e.g. RAG_DOCUMENT_PATHS=docs/:extra.txt
+        env_paths = [p for p in os.getenv("RAG_DOCUMENT_PATHS", "").split(os.pathsep) if p]
+        self.document_paths = list(document_paths or env_paths or [self.document_path])
+        self.chunking_methods = self.create_chunking_methods()
+        # Built indexes are persisted here so restarts skip re-embedding
+        self.index_store = IndexStore(index_cache_dir or os.getenv("RAG_INDEX_CACHE_DIR", ".index_cache"))
+        # Chunks shared between splitters (or unchanged across re-ingests) are embedded once
+        # The embedding model itself is only loaded on the first cache miss
+        embedding_workers = int(embedding_workers or os.getenv("RAG_EMBEDDING_WORKERS", "0"))
+        # Unix socket of a shared embedding service (rag.embedding_service), so worker
+        # processes on one host use one copy of the model instead of loading their own
+        self.embedding_socket = embedding_socket or os.getenv("RAG_EMBEDDING_SOCKET")
+        self.embeddings = CachedEmbeddings(
+            lambda: self._create_base_embeddings(embedding_workers),
+            model_name=self.embedding_model_name,
+            cache_path=os.path.join(self.index_store.cache_dir, "embeddings.sqlite3")
         )
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.ingestion = IngestionPipeline(
+            self.chunking_methods,
+            self.embeddings,
+            batch_size=int(os.getenv("RAG_INGEST_BATCH_SIZE", "256"))
         )
-        self.document_path = "sample_document.txt"
-        self.chunking_methods = {
+        self.top_k = int(os.getenv("RAG_TOP_K", "3"))  # chunks passed to the LLM per question
+        # "hybrid" fuses FAISS and BM25 rankings; "dense" is FAISS only
+        self.retrieval_mode = retrieval_mode or os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+        if self.retrieval_mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode}")
+        self.hybrid_candidates = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))  # per ranking, before fusion
+        # Cross-encoder reranking of a larger candidate pool: RAG_RERANK=1 turns it on for every method,
+        # RAG_RERANK_CONFIG='{"recursive": {"candidates": 30, "top_n": 2, "budget_ms": 100}}' per method
+        self.rerank_default = os.getenv("RAG_RERANK", "0").lower() in ("1", "true", "yes")
+        self.rerank_configs = rerank_configs or json.loads(os.getenv("RAG_RERANK_CONFIG", "{}"))
+        self._reranker = None  # cross-encoder, loaded on first use
+        self._reranker_lock = threading.Lock()
+        self.sparse_indexes = {}
+        # Per-method ANN settings, e.g. RAG_INDEX_CONFIG='{"recursive": {"type": "hnsw", "ef_search": 64}}'
+        self.default_index_type = os.getenv("RAG_INDEX_TYPE", "flat")
+        self.index_configs = index_configs or json.loads(os.getenv("RAG_INDEX_CONFIG", "{}"))
+        self.ann_indexes = {}
+        # "fp16"/"int8" serve vectors and chunk texts from a compact memory-mapped file per method
+        # (shared between worker processes); "float32" keeps the plain FAISS store
+        self.vector_storage = vector_storage or os.getenv("RAG_VECTOR_STORAGE", "float32")
+        if self.vector_storage not in ("float32", "fp16", "int8"):
+            raise ValueError(f"Unknown vector storage: {self.vector_storage}")
+        # Whole-prompt token budget; heavier templates leave less room for context.
+        # RAG_CONTEXT_BUDGETS='{"few_shot": 600}' pins the context budget for specific prompt methods.
+        self.prompt_token_budget = int(os.getenv("RAG_PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET))
+        self.context_budgets = context_budgets or json.loads(os.getenv("RAG_CONTEXT_BUDGETS", "{}"))
+        self.answer_cache = self._create_answer_cache(
+            answer_cache_mode or os.getenv("RAG_ANSWER_CACHE", "exact"),
+            answer_cache_backend or os.getenv("RAG_ANSWER_CACHE_BACKEND", "memory")
+        )
+        self.vector_stores = {}
+        self.manifests = {}
+        self.chunk_stats = {}  # per-method statistics, refreshed whenever an index changes
+        self._ingest_lock = threading.Lock()
+        # Guards publishing a method's store together with its ANN/BM25 indexes (see _swap_indexes)
+        self._swap_lock = threading.Lock()
+        self.qa_chains = {}
+        # (method_name, prompt_method) -> RetrievalQA, built once and reused across queries
+        self._chain_cache = {}
+        self._chain_lock = threading.Lock()
+        # Identical questions asked at the same moment share one retrieval + LLM call
+        self._in_flight = SingleFlight()
+        # Shared pool for fanning a question out to every chunking method at once
+        self.compare_timeout = float(compare_timeout or os.getenv("RAG_COMPARE_TIMEOUT", "60"))
+        self._compare_executor = ThreadPoolExecutor(
+            max_workers=int(compare_workers or os.getenv("RAG_COMPARE_WORKERS", "8")),
+            thread_name_prefix="rag-compare"
+        )
+        self.load_and_process_document()
+
+    @staticmethod
+    def create_chunking_methods():
+        """Splitter per chunking method; each gets its own index"""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter # sentence_splitter
+        return {
             "fixed_size": RecursiveCharacterTextSplitter(
                 chunk_size=500,
                 chunk_overlap=50,
@@ -48,103 +135,776 @@ class RAGSystem:
                 separators=["\n\n", "\n", ". ", " ", ""]
             )
         }
-        self.vector_stores = {}
-        self.qa_chains = {}
-        self.load_and_process_document()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = self._create_llm()
+        return self._llm
+
+    def _create_llm(self):
+        if self.llm_backend == "fake":
+            from rag.fake_llm import FakeChatModel, LATENCY_DISTRIBUTIONS
+            distribution = os.getenv("RAG_FAKE_LLM_LATENCY_DISTRIBUTION", "fixed")
+            if distribution not in LATENCY_DISTRIBUTIONS:
+                raise ValueError(f"Unknown latency distribution: {distribution}")
+            return FakeChatModel(
+                latency=float(os.getenv("RAG_FAKE_LLM_LATENCY", "0")),  # mean seconds to first token
+                latency_distribution=distribution,
+                tokens_per_second=float(os.getenv("RAG_FAKE_LLM_TOKENS_PER_SECOND", "0")),
+                seed=int(os.getenv("RAG_FAKE_LLM_SEED", "0"))
+            )
+        import httpx
+        from langchain_groq import ChatGroq
+        # Keep-alive pools shared by every chain, sized to the concurrency limit
+        limits = httpx.Limits(
+            max_connections=self.llm_concurrency,
+            max_keepalive_connections=self.llm_concurrency
+        )
+        timeout = httpx.Timeout(self.llm_timeout, connect=10.0)
+        return ChatGroq(
+            api_key=self.groq_api_key,
+            model=self.llm_model,
+            temperature=0,  #Ensures deterministic output (no randomness).
+            max_tokens=None,
+            reasoning_format="parsed",
+            timeout=self.llm_timeout,
+            max_retries=2,
+            http_client=httpx.Client(limits=limits, timeout=timeout),
+            http_async_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+        )
+
+    @property
+    def reranker(self):
+        if self._reranker is None:
+            with self._reranker_lock:
+                if self._reranker is None:
+                    self._reranker = self._create_reranker()
+        return self._reranker
+
+    def _create_reranker(self):
+        from rag.reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+        return CrossEncoderReranker(
+            os.getenv("RAG_RERANK_MODEL", DEFAULT_RERANK_MODEL),
+            batch_size=int(os.getenv("RAG_RERANK_BATCH_SIZE", "16"))
+        )
+
+    def _create_base_embeddings(self, workers):
+        if self.embedding_socket:
+            from rag.embedding_service import ensure_embedding_service
+            return ensure_embedding_service(self.embedding_socket, self.embedding_model_name)
+        if workers <= 0:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            return HuggingFaceEmbeddings(model_name=self.embedding_model_name)
+        from rag.parallel_embeddings import ParallelEmbeddings
+        # Large ingests: shard embedding batches over worker processes
+        return ParallelEmbeddings(
+            self.embedding_model_name,
+            workers=workers,
+            batch_size=int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "64")),
+            threads_per_worker=int(os.getenv("RAG_EMBEDDING_THREADS", "1"))
+        )
+
+    def _create_answer_cache(self, mode, backend_name):
+        from rag.answer_cache import AnswerCache, InMemoryAnswerBackend, SQLiteAnswerBackend
+        # temperature=0 makes answers a function of prompt, context and question, so they can be reused
+        ttl = float(os.getenv("RAG_ANSWER_CACHE_TTL", "86400"))
+        if backend_name == "sqlite":
+            backend = SQLiteAnswerBackend(os.path.join(self.index_store.cache_dir, "answers.sqlite3"), ttl=ttl)
+        elif backend_name == "memory":
+            backend = InMemoryAnswerBackend(ttl=ttl)
+        else:
+            raise ValueError(f"Unknown answer cache backend: {backend_name}")
+        return AnswerCache(
+            backend=backend,
+            mode=mode,
+            embeddings=self.embeddings,
+            similarity_threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95")),
+            # Anything that changes what the LLM is asked, or by which model, splits the cache
+            generation_config={
+                "backend": self.llm_backend,
+                "model": self.llm_model,
+                "prompt_token_budget": self.prompt_token_budget,
+                "context_budgets": self.context_budgets,
+            }
+        )
 
     def load_and_process_document(self):
         try:
-            loader = TextLoader(self.document_path)
-            documents = loader.load()
-            for method_name, splitter in self.chunking_methods.items():
-                chunks = splitter.split_documents(documents)
-                vector_store = FAISS.from_documents(chunks, self.embeddings)
-                self.vector_stores[method_name] = vector_store
-                qa_chain = RetrievalQA.from_chain_type(
-                    llm=self.llm,
-                    chain_type="stuff", # stuff: pass the entire context to the language model
-                    retriever=vector_store.as_retriever(search_kwargs={"k": 3}),
-                    return_source_documents=True,
-                    chain_type_kwargs={
-                        "prompt": PromptTemplate(
-                            template="""Use the following pieces of context to answer the question at the end. \
-                                        If you don't know the answer, just say that you don't know, don't try to make up an answer.\n\nContext: {context}\n\nQuestion: {question}\n\nAnswer:""", # prompt template
-                            input_variables=["context", "question"]
-                        )
-                    },
-                    input_key="question"
-                )
-                self.qa_chains[method_name] = qa_chain
+            self.ingest()
         except Exception as e:
             logging.error(f"Error loading document: {str(e)}")
             raise
 
+    def _index_key(self, method_name):
+        # One corpus per cache directory; document-level changes live in the manifest
+        return self.index_store.make_key("corpus", self.chunking_methods[method_name], self.embedding_model_name)
+
+    def ingest(self, sources=None):
+        """Bring the indexes in line with the corpus, re-embedding only new or changed files.
+
+        With no arguments the whole corpus (document_paths) is synced and files
+        that are gone are dropped. Passing sources adds them to the corpus and
+        ingests just those. Changes are made to copies of the affected stores,
+        and each method's store, ANN and BM25 indexes are swapped in together
+        once they are complete, so concurrent queries see either the old or
+        the new index, never one in between.
+
+        Processes sharing the index cache ingest one at a time: the first to
+        start builds the indexes and the others then load them from the cache.
+        """
+        from rag.file_lock import file_lock
+        with self._ingest_lock, file_lock(os.path.join(self.index_store.cache_dir, ".ingest.lock")), \
+                metrics.span("ingest"):
+            live = dict(self.vector_stores)
+            stores = self._current_stores(live)
+            remove_missing = sources is None
+            if sources is None:
+                sources = self.document_paths
+            else:
+                sources = list(sources)
+                self.document_paths.extend(s for s in sources if s not in self.document_paths)
+            keys = {method_name: self._index_key(method_name) for method_name in self.chunking_methods}
+            for method_name, key in keys.items():
+                if method_name not in stores:
+                    vector_store = None
+                    if self.vector_storage != "float32":
+                        vector_store = self.index_store.load_compact(
+                            method_name, key, self.embeddings, self.vector_storage
+                        )
+                    if vector_store is None:
+                        vector_store = self.index_store.load(method_name, key, self.embeddings)
+                    if vector_store is not None:
+                        stores[method_name] = vector_store
+                        self.manifests[method_name] = self.index_store.load_manifest(method_name, key)
+            stores_before = dict(stores)
+            summary = self.ingestion.ingest(sources, stores, self.manifests, remove_missing)
+            # Listed files and directories that were deleted are no longer part of the corpus
+            gone = [path for path in self.document_paths if not os.path.exists(path)]
+            if gone:
+                logging.info(f"Removed from the corpus: {gone}")
+                self.document_paths = [path for path in self.document_paths if path not in gone]
+            changed = summary["added"] + summary["updated"] + summary["removed"] > 0
+            for method_name, key in keys.items():
+                if method_name not in stores:
+                    continue
+                vector_store = stores[method_name]
+                replaced = stores_before.get(method_name) is not vector_store
+                swapped = live.get(method_name) is not vector_store
+                persisted = True
+                if changed or replaced:
+                    persisted = self.index_store.save(method_name, key, vector_store, self.manifests[method_name])
+                chunk_stats = self.chunk_stats.get(method_name)
+                if changed or swapped or chunk_stats is None:
+                    from rag.chunk_stats import compute_chunk_stats
+                    chunk_stats = compute_chunk_stats(vector_store, self.manifests[method_name])
+                ann = self._ann_index_for(method_name, key, vector_store)
+                if persisted:
+                    vector_store = self._compact_store_for(method_name, key, vector_store, changed or replaced)
+                sparse = None
+                if self.retrieval_mode == "hybrid":
+                    sparse = self.sparse_indexes.get(method_name)
+                    if changed or swapped or sparse is None:
+                        sparse = self._sparse_index_for(method_name, key, vector_store, persisted)
+                self._swap_indexes(method_name, vector_store, ann, sparse, chunk_stats)
+            for method_name in set(live) - set(stores):
+                # Stale and no longer in the cache
+                self._swap_indexes(method_name, None, None, None, None)
+            return summary
+
+    def _current_stores(self, live):
+        """live minus compact stores another process has re-ingested since; those are reloaded from the cache"""
+        stores = {}
+        for method_name, vector_store in live.items():
+            compact = getattr(vector_store.docstore, "compact", None)
+            if compact is None or compact.is_current():
+                stores[method_name] = vector_store
+        return stores
+
+    def _swap_indexes(self, method_name, vector_store, ann, sparse, chunk_stats):
+        """Publish a method's store and derived indexes at once (None removes them)"""
+        previous = self.vector_stores.get(method_name)
+        with self._swap_lock:
+            for indexes, value in ((self.vector_stores, vector_store), (self.ann_indexes, ann),
+                                   (self.sparse_indexes, sparse), (self.chunk_stats, chunk_stats)):
+                if value is None:
+                    indexes.pop(method_name, None)
+                else:
+                    indexes[method_name] = value
+        if vector_store is not previous:
+            # Cached chains hold a retriever bound to the old store object; rebuild the ones in use
+            prompt_methods = [key[1] for key in list(self._chain_cache) if key[0] == method_name]
+            self.invalidate_chains(method_name)
+            if vector_store is None:
+                self.qa_chains.pop(method_name, None)
+                return
+            for prompt_method in prompt_methods:
+                self.get_qa_chain(method_name, prompt_method)
+        self.qa_chains[method_name] = self.get_qa_chain(method_name, 'default')
+
+    def _retrieval_state(self, method_name):
+        """(vector store, ANN index, BM25 index) of method_name, read together so they always match"""
+        with self._swap_lock:
+            if method_name not in self.vector_stores:
+                raise KeyError(f"Method {method_name} not found")
+            return self.vector_stores[method_name], self.ann_indexes.get(method_name), \
+                self.sparse_indexes.get(method_name)
+
+    def _rerank_config(self, method_name):
+        """Rerank settings for method_name, or None if its retrieval is not reranked"""
+        config = dict(self.rerank_configs.get(method_name, {}))
+        if not config.pop("enabled", self.rerank_default or method_name in self.rerank_configs):
+            return None
+        return {
+            "candidates": int(config.get("candidates", os.getenv("RAG_RERANK_CANDIDATES", "20"))),
+            "top_n": int(config.get("top_n", self.top_k)),
+            "budget_ms": float(config.get("budget_ms", os.getenv("RAG_RERANK_BUDGET_MS", "200"))),
+            "min_score": config.get("min_score"),
+        }
+
+    def _index_config(self, method_name):
+        config = dict(self.index_configs.get(method_name, {}))
+        index_type = config.pop("type", self.default_index_type)
+        return index_type, config
+
+    def _ann_index_for(self, method_name, key, vector_store):
+        """Approximate index configured for method_name, loaded or (re)built for vector_store's vectors"""
+        index_type, params = self._index_config(method_name)
+        if index_type == "flat":
+            # The store's own IndexFlatL2 already is the exact index
+            return None
+        import copy
+        from rag.ann_index import AnnIndex, content_stamp
+        stamp = content_stamp(vector_store.index_to_docstore_id)
+        directory = self.index_store.entry_path(method_name, key)
+        ann = self.ann_indexes.get(method_name)
+        if ann is None or ann.requested_type != index_type or ann.params != params:
+            ann = AnnIndex.load(directory, index_type, params) or AnnIndex(index_type, params)
+        if ann.stamp != stamp:
+            # Queries may be searching the live index; rebuild a copy, reusing its trained centroids/codebooks
+            ann = copy.copy(ann)
+            ann.build(vector_store.index.reconstruct_n(0, vector_store.index.ntotal), stamp)
+            try:
+                ann.save(directory)
+            except OSError as e:
+                logging.warning(f"Could not persist {index_type} index for {method_name}: {str(e)}")
+        return ann
+
+    def _sparse_index_for(self, method_name, key, vector_store, persisted):
+        """Map the BM25 index saved with the cache entry, or build (and save) it"""
+        from rag.ann_index import content_stamp
+        from rag.bm25 import BM25Index
+        stamp = content_stamp(vector_store.index_to_docstore_id)
+        directory = self.index_store.entry_path(method_name, key)
+        sparse = BM25Index.load(directory, stamp)
+        if sparse is None:
+            sparse = BM25Index.from_vector_store(vector_store)
+            if persisted:
+                try:
+                    sparse.save(directory, stamp)
+                except OSError as e:
+                    logging.warning(f"Could not persist BM25 index for {method_name}: {str(e)}")
+        return sparse
+
+    def _compact_store_for(self, method_name, key, vector_store, changed):
+        """vector_store served from its compact file, writing the file first if needed"""
+        if self.vector_storage == "float32":
+            return vector_store
+        from rag.compact_store import CompactDocstore
+        if not changed and isinstance(vector_store.docstore, CompactDocstore):
+            return vector_store
+        compact_store = self.index_store.save_compact(method_name, key, vector_store, self.vector_storage)
+        # The float32 index goes back to disk and is only read again by the next ingestion
+        # that changes this method
+        return compact_store or vector_store
+
+    def index_report(self, method_name, k=10, questions=None, n_queries=200, configs=None):
+        """Recall@k and latency of ANN index types versus exact search on method_name's vectors.
+
+        Queries are the embedded questions if given, otherwise a sample of the
+        stored chunk vectors.
+        """
+        import numpy as np
+        from rag.ann_index import recall_latency_report
+        index = self.vector_stores[method_name].index
+        vectors = index.reconstruct_n(0, index.ntotal)
+        if questions:
+            queries = self.embed_questions(questions)
+        else:
+            rows = np.random.default_rng(0).choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+            queries = vectors[rows]
+        return recall_latency_report(vectors, queries, min(k, len(vectors)), configs)
+
     def get_chunking_analysis(self):
-        analysis = {}
-        try:
-            loader = TextLoader(self.document_path)
-            documents = loader.load()
-            for method_name, splitter in self.chunking_methods.items():
-                chunks = splitter.split_documents(documents)
-                chunk_lengths = [len(chunk.page_content) for chunk in chunks]
-                analysis[method_name] = {
-                    "total_chunks": len(chunks),
-                    "avg_chunk_length": sum(chunk_lengths) / len(chunk_lengths) if chunk_lengths else 0,
-                    "min_chunk_length": min(chunk_lengths) if chunk_lengths else 0,
-                    "max_chunk_length": max(chunk_lengths) if chunk_lengths else 0,
-                    "sample_chunk": chunks[0].page_content[:200] + "..." if chunks else ""
-                }
-        except Exception as e:
-            logging.error(f"Error in chunking analysis: {str(e)}")
-            analysis = {"error": str(e)}
-        return analysis
+        """Per-method chunk statistics recorded at ingest time; cheap enough to poll"""
+        if not self.chunk_stats:
+            return {"error": "No documents have been ingested"}
+        return dict(self.chunk_stats)
+
+    def get_stats(self):
+        with self._swap_lock:
+            vector_stores, ann_indexes = dict(self.vector_stores), dict(self.ann_indexes)
+            chunk_stats = dict(self.chunk_stats)
+        chunks_per_method = {
+            method_name: stats["total_chunks"] for method_name, stats in chunk_stats.items()
+        }
+        return {
+            "total_docs": max((stats["total_documents"] for stats in chunk_stats.values()), default=0),
+            "total_chunks": sum(chunks_per_method.values()),
+            "chunks_per_method": chunks_per_method,
+            "index_size_bytes": sum(stats["index_size_bytes"] for stats in chunk_stats.values()),
+            "index_types": {
+                method_name: ann_indexes[method_name].index_type if method_name in ann_indexes else "flat"
+                for method_name in vector_stores
+            },
+            "vector_storage": self.vector_storage,
+            "compact_store_bytes": sum(
+                vector_store.docstore.compact.size_bytes() for vector_store in vector_stores.values()
+                if hasattr(vector_store.docstore, "compact")
+            ),
+            "embedding_cache": self.embeddings.get_stats(),
+            "answer_cache": self.answer_cache.get_stats(),
+            "coalescing": self._in_flight.get_stats(),
+            "reranker": self._reranker.get_stats() if self._reranker is not None else {},
+            "latency": metrics.summary()
+        }
+
+    def metrics_gauges(self):
+        """Numeric leaves of get_stats() flattened to Prometheus-style names, e.g. answer_cache_hits"""
+        gauges = {}
+        def flatten(prefix, value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    flatten(f"{prefix}_{key}" if prefix else str(key), item)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[prefix] = value
+        stats = self.get_stats()
+        stats.pop("latency")  # already exported as histograms
+        flatten("", stats)
+        return gauges
 
     def get_prompting_methods(self):
         return PROMPTING_METHODS
 
-    def query_with_method(self, question, method_name, prompt_method=None, custom_prompt=None):
+    @staticmethod
+    def resolve_prompt_method(prompt_method):
+        """Map a requested prompt method onto the template PromptGenerator will actually use"""
+        if not prompt_method:
+            return 'default'
+        # PromptGenerator falls back to zero-shot for unknown methods
+        return prompt_method if prompt_method in PROMPTING_METHODS else 'zero_shot'
+
+    def _build_qa_chain(self, method_name, prompt_method):
+        from langchain.chains import RetrievalQA # custom prompt templates for the language model
+        from langchain.prompts import PromptTemplate
+        prompt = PromptTemplate(
+            template=PromptGenerator.get_template(prompt_method),
+            input_variables=["context", "question"]
+        )
+        return RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff", # stuff: pass the entire context to the language model
+            retriever=self.vector_stores[method_name].as_retriever(search_kwargs={"k": self.top_k}),
+            return_source_documents=True,
+            chain_type_kwargs={"prompt": prompt},
+            input_key="question"
+        )
+
+    def get_qa_chain(self, method_name, prompt_method=None):
+        """Cached QA chain for (method_name, prompt_method), built on first use"""
+        key = (method_name, self.resolve_prompt_method(prompt_method))
+        qa_chain = self._chain_cache.get(key)
+        if qa_chain is None:
+            with self._chain_lock:
+                qa_chain = self._chain_cache.get(key)
+                if qa_chain is None:
+                    with metrics.span("chain_build"):
+                        qa_chain = self._build_qa_chain(*key)
+                    self._chain_cache[key] = qa_chain
+        return qa_chain
+
+    def invalidate_chains(self, method_name=None):
+        """Drop cached chains, e.g. after a vector store has been replaced"""
+        with self._chain_lock:
+            for key in list(self._chain_cache):
+                if method_name is None or key[0] == method_name:
+                    del self._chain_cache[key]
+
+    def warm_up(self, method_names=None, prompt_methods=None):
+        """Build chains ahead of time so the first request doesn't pay for construction"""
+        for method_name in method_names or list(self.vector_stores):
+            for prompt_method in prompt_methods or list(PROMPTING_METHODS):
+                self.get_qa_chain(method_name, prompt_method)
+        if any(self._rerank_config(method_name) for method_name in method_names or list(self.vector_stores)):
+            self.reranker.warm_up()
+        return len(self._chain_cache)
+
+    def embed_questions(self, questions):
+        """Question embeddings as a float32 matrix, computed in one batch"""
+        import numpy as np
+        with metrics.span("question_embedding"):
+            return np.asarray(self.embeddings.embed_queries(list(questions)), dtype=np.float32)
+
+    def _dense_search_ids(self, vector_store, ann, vectors, k):
+        import numpy as np
+        import faiss
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        if vector_store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        compact = getattr(vector_store.docstore, "compact", None)
+        # ANN indexes and compact files are built from the flat index in the same order, so
+        # positions line up; should they ever disagree, exact search is used
+        if ann is not None and ann.index.ntotal == vector_store.index.ntotal:
+            searcher = ann.index
+        elif compact is not None and vector_store.docstore.pristine:
+            searcher = compact
+        else:
+            searcher = vector_store.index
+        with metrics.span("vector_search"):
+            _, indices = searcher.search(vectors, k)
+        # -1 marks empty slots when the index holds fewer than k chunks
+        return [[vector_store.index_to_docstore_id[i] for i in row if i != -1] for row in indices]
+
+    def search_by_vectors(self, method_name, vectors, k=None):
+        """Run one FAISS search over a stacked matrix of question vectors"""
+        vector_store, ann, _ = self._retrieval_state(method_name)
+        return [
+            [vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+            for doc_ids in self._dense_search_ids(vector_store, ann, vectors, k or self.top_k)
+        ]
+
+    def retrieve_batch(self, questions, method_name, k=None, question_vectors=None):
+        """Top-k chunks for each question, using one embedding call and one FAISS search.
+
+        In hybrid mode the dense candidates are fused with BM25 candidates by
+        reciprocal rank fusion, so exact-term matches are not lost at small k.
+        When reranking is configured for method_name, a larger candidate pool
+        is retrieved and the cross-encoder picks the final k (default top_n).
+        """
+        rerank = self._rerank_config(method_name)
+        if rerank is None:
+            return self._retrieve_candidates(questions, method_name, k or self.top_k, question_vectors)
+        top_n = k or rerank["top_n"]
+        candidates = self._retrieve_candidates(
+            questions, method_name, max(top_n, rerank["candidates"]), question_vectors
+        )
+        if not candidates:
+            return candidates
+        with metrics.span("rerank"):
+            return self.reranker.rerank_batch(
+                questions, candidates, top_n, rerank["budget_ms"] / 1000, rerank["min_score"]
+            )
+
+    def _retrieve_candidates(self, questions, method_name, k, question_vectors=None):
+        # One snapshot for the whole batch; an ingest swaps in new objects rather than changing these
+        vector_store, ann, sparse_index = self._retrieval_state(method_name)
+        if not questions:
+            return []
+        if question_vectors is None:
+            question_vectors = self.embed_questions(questions)
+        docstore = vector_store.docstore
+        if self.retrieval_mode != "hybrid" or sparse_index is None:
+            return [
+                [docstore.search(doc_id) for doc_id in doc_ids]
+                for doc_ids in self._dense_search_ids(vector_store, ann, question_vectors, k)
+            ]
+        from rag.bm25 import reciprocal_rank_fusion
+        pool = max(k, self.hybrid_candidates)
+        results = []
+        dense_rankings = self._dense_search_ids(vector_store, ann, question_vectors, pool)
+        for question, dense_ids in zip(questions, dense_rankings):
+            with metrics.span("bm25_search"):
+                sparse_ids = [doc_id for doc_id, _ in sparse_index.search(question, pool)]
+            fused = reciprocal_rank_fusion([dense_ids, sparse_ids])[:k]
+            results.append([docstore.search(doc_id) for doc_id in fused])
+        return results
+
+    @staticmethod
+    def format_source_documents(source_documents):
+        return [
+            {
+                "content": doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content,
+                "metadata": doc.metadata
+            }
+            for doc in source_documents
+        ]
+
+    def assemble_context(self, source_documents, prompt_method):
+        """Chunks to put in the prompt: overlaps merged, near-duplicates dropped, trimmed to budget"""
+        from rag.context_assembly import assemble_context
+        budget = self.context_budgets.get(prompt_method)
+        if budget is None:
+            budget = PromptGenerator.context_token_budget(prompt_method, self.prompt_token_budget)
+        with metrics.span("context_assembly"):
+            return assemble_context(source_documents, budget)
+
+    def _prepare_query(self, question, method_name, prompt_method, source_documents):
+        """Everything before the LLM call: chain, retrieval, context and any cached answer"""
+        prompt_method = self.resolve_prompt_method(prompt_method)
+        qa_chain = self.get_qa_chain(method_name, prompt_method)
+        # Retrieve first so the answer cache can key on the exact context the LLM would see
+        if source_documents is None:
+            source_documents = self.retrieve_batch([question], method_name)[0]
+        context_documents = self.assemble_context(source_documents, prompt_method)
+        answer = self._cached_answer(prompt_method, source_documents, question)
+        return prompt_method, qa_chain, source_documents, context_documents, answer
+
+    def _cached_answer(self, prompt_method, source_documents, question):
+        with metrics.span("answer_cache"):
+            answer = self.answer_cache.get(prompt_method, source_documents, question)
+        metrics.inc("answer_cache_lookups", result="miss" if answer is None else "hit")
+        return answer
+
+    @staticmethod
+    def _record_llm_tokens(context_documents, answer):
+        from rag.chunk_stats import approx_token_count
+        from rag.context_assembly import count_context_tokens
+        metrics.inc("llm_tokens", count_context_tokens(context_documents), kind="context")
+        metrics.inc("llm_tokens", approx_token_count(answer), kind="answer")
+
+    def _query_result(self, method_name, source_documents, context_documents, answer, cached):
+        from rag.context_assembly import count_context_tokens
+        return {
+            "answer": answer,
+            "source_documents": self.format_source_documents(source_documents),
+            "method": method_name,
+            "cached": cached,
+            "context_tokens": count_context_tokens(context_documents)
+        }
+
+    def _flight_key(self, question, method_name, prompt_method):
+        from rag.answer_cache import normalize_question
+        return normalize_question(question), method_name, self.resolve_prompt_method(prompt_method)
+
+    def query_with_method(self, question, method_name, prompt_method=None, custom_prompt=None,
+                          source_documents=None):
+        """Answer question with method_name's index; pass source_documents to skip retrieval"""
+        return self._in_flight.do(
+            self._flight_key(question, method_name, prompt_method),
+            self._query_with_method, question, method_name, prompt_method, source_documents
+        )
+
+    def _query_with_method(self, question, method_name, prompt_method, source_documents):
         try:
             if method_name not in self.vector_stores:
                 return {"error": f"Method {method_name} not found"}
-            # Load the document context
-            loader = TextLoader(self.document_path)
-            documents = loader.load()
-            context = documents[0].page_content if documents else ""
-
-            # Choose prompt template
-            from rag.PromptGenerator import PromptGenerator
-            if not prompt_method or prompt_method == 'default':
-                prompt_template = PromptGenerator.create_default_prompt(context)
-            else:
-                prompt_template = PromptGenerator.create_prompt_by_method(context, prompt_method)
+            with metrics.span("query"):
+                return self._run_query(question, method_name, prompt_method, source_documents)
+        except Exception as e:
+            logging.error(f"Error querying with method {method_name}: {str(e)}")
+            return {"error": str(e)}
+
+    def _run_query(self, question, method_name, prompt_method, source_documents):
+        prompt_method, qa_chain, source_documents, context_documents, answer = self._prepare_query(
+            question, method_name, prompt_method, source_documents
+        )
+        cached = answer is not None
+        if not cached:
+            with metrics.span("llm"):
+                answer = qa_chain.combine_documents_chain.invoke(
+                    {"input_documents": context_documents, "question": question}
+                )["output_text"]
+            self._record_llm_tokens(context_documents, answer)
+            self.answer_cache.put(prompt_method, source_documents, question, answer)
+        return self._query_result(method_name, source_documents, context_documents, answer, cached)
+
+    def _llm_slots(self):
+        import asyncio
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.llm_concurrency)
+        return self._llm_semaphore
 
-            prompt = PromptTemplate(
-                template=prompt_template,
-                input_variables=["context", "question"]
+    async def aquery_with_method(self, question, method_name, prompt_method=None, custom_prompt=None,
+                                 source_documents=None, timeout=None):
+        """Async query_with_method for an ASGI server's event loop.
+
+        Retrieval runs in a worker thread and the LLM call awaits the pooled
+        async client, with at most llm_concurrency calls in flight. timeout is a
+        deadline in seconds for the whole request, including waiting for a slot.
+        """
+        import asyncio
+        timeout = self.llm_timeout if timeout is None else float(timeout)
+        try:
+            with metrics.span("query"):
+                return await asyncio.wait_for(self._in_flight.ado(
+                    self._flight_key(question, method_name, prompt_method),
+                    self._aquery, question, method_name, prompt_method, source_documents
+                ), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Method {method_name} timed out after {timeout}s")
+            return {"error": f"Timed out after {timeout}s", "method": method_name}
+
+    async def _aquery(self, question, method_name, prompt_method, source_documents):
+        import asyncio
+        try:
+            if method_name not in self.vector_stores:
+                return {"error": f"Method {method_name} not found"}
+            prompt_method, qa_chain, source_documents, context_documents, answer = await asyncio.to_thread(
+                self._prepare_query, question, method_name, prompt_method, source_documents
             )
+            cached = answer is not None
+            if not cached:
+                async with self._llm_slots():
+                    with metrics.span("llm"):
+                        result = await qa_chain.combine_documents_chain.ainvoke(
+                            {"input_documents": context_documents, "question": question}
+                        )
+                answer = result["output_text"]
+                self._record_llm_tokens(context_documents, answer)
+                self.answer_cache.put(prompt_method, source_documents, question, answer)
+            return self._query_result(method_name, source_documents, context_documents, answer, cached)
+        except Exception as e:
+            logging.error(f"Error querying with method {method_name}: {str(e)}")
+            return {"error": str(e)}
+
+    def compare_methods(self, question, prompt_method=None, custom_prompt=None, method_names=None, timeout=None):
+        """Query several chunking methods concurrently.
 
-            # Build a new QA chain with the selected prompt
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vector_stores[method_name].as_retriever(search_kwargs={"k": 3}),
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": prompt},
-                input_key="question"
+        Methods that have not answered within timeout seconds get an error entry
+        instead of holding up the others.
+        """
+        method_names = list(method_names or self.vector_stores)
+        timeout = self.compare_timeout if timeout is None else float(timeout)
+        # Embed the question once and search every index with the same vector
+        try:
+            question_vector = self.embed_questions([question])
+        except Exception as e:
+            logging.error(f"Error embedding question: {str(e)}")
+            return {method_name: {"error": str(e), "method": method_name} for method_name in method_names}
+        futures = {
+            method_name: self._compare_executor.submit(
+                self._compare_method, question, method_name, prompt_method, custom_prompt, question_vector
             )
+            for method_name in method_names
+        }
+        done, _ = wait(futures.values(), timeout=timeout)
+        results = {}
+        for method_name, future in futures.items():
+            if future in done:
+                results[method_name] = future.result()
+            else:
+                future.cancel()
+                logging.warning(f"Method {method_name} timed out after {timeout}s")
+                results[method_name] = {"error": f"Timed out after {timeout}s", "method": method_name}
+        return results
 
-            result = qa_chain({"question": question})
-            return {
-                "answer": result["result"],
-                "source_documents": [
-                    {
-                        "content": doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content,
-                        "metadata": doc.metadata
-                    }
-                    for doc in result["source_documents"]
-                ],
+    def _compare_method(self, question, method_name, prompt_method, custom_prompt, question_vector):
+        """One method's share of compare_methods: retrieval (and any rerank), then the answer"""
+        try:
+            source_documents = None
+            if method_name in self.vector_stores:
+                source_documents = self.retrieve_batch([question], method_name, question_vectors=question_vector)[0]
+        except Exception as e:
+            logging.error(f"Error retrieving with method {method_name}: {str(e)}")
+            return {"error": str(e), "method": method_name}
+        return self.query_with_method(question, method_name, prompt_method, custom_prompt, source_documents)
+
+    async def acompare_methods(self, question, prompt_method=None, custom_prompt=None, method_names=None,
+                               timeout=None):
+        """Async compare_methods: every method's LLM call is awaited concurrently on the event loop"""
+        import asyncio
+        method_names = list(method_names or self.vector_stores)
+        timeout = self.compare_timeout if timeout is None else float(timeout)
+        try:
+            question_vector = await asyncio.to_thread(self.embed_questions, [question])
+        except Exception as e:
+            logging.error(f"Error embedding question: {str(e)}")
+            return {method_name: {"error": str(e), "method": method_name} for method_name in method_names}
+
+        async def compare_method(method_name):
+            source_documents = None
+            if method_name in self.vector_stores:
+                source_documents = (await asyncio.to_thread(
+                    self.retrieve_batch, [question], method_name, None, question_vector
+                ))[0]
+            return await self.aquery_with_method(
+                question, method_name, prompt_method, custom_prompt, source_documents, timeout
+            )
+
+        async def bounded(method_name):
+            # The deadline covers retrieval as well as the LLM call
+            try:
+                return await asyncio.wait_for(compare_method(method_name), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"Method {method_name} timed out after {timeout}s")
+                return {"error": f"Timed out after {timeout}s", "method": method_name}
+            except Exception as e:
+                logging.error(f"Error querying with method {method_name}: {str(e)}")
+                return {"error": str(e), "method": method_name}
+
+        results = await asyncio.gather(*(bounded(method_name) for method_name in method_names))
+        return dict(zip(method_names, results))
+
+    def query_batch(self, questions, method_name, prompt_method=None):
+        """Answer several questions with one vectorized retrieval pass"""
+        retrieved = self.retrieve_batch(questions, method_name)
+        return [
+            self.query_with_method(question, method_name, prompt_method, source_documents=source_documents)
+            for question, source_documents in zip(questions, retrieved)
+        ]
+
+    def stream_query(self, question, method_name, prompt_method=None):
+        """Yield (event, data) pairs: "sources" right after retrieval, then "token"s, then "done".
+
+        Failures are reported as an "error" event rather than raised, since the
+        caller has usually started sending a response by then.
+        """
+        try:
+            if method_name not in self.vector_stores:
+                yield "error", {"error": f"Method {method_name} not found"}
+                return
+            prompt_method = self.resolve_prompt_method(prompt_method)
+            combine_chain = self.get_qa_chain(method_name, prompt_method).combine_documents_chain
+            source_documents = self.retrieve_batch([question], method_name)[0]
+            yield "sources", {
+                "source_documents": self.format_source_documents(source_documents),
                 "method": method_name
             }
+            answer = self._cached_answer(prompt_method, source_documents, question)
+            cached = answer is not None
+            if cached:
+                yield "token", {"text": answer}
+            else:
+                flight_key = ("stream",) + self._flight_key(question, method_name, prompt_method)
+                leader, flight = self._in_flight.begin(flight_key)
+                if not leader:
+                    # The same answer is already being streamed elsewhere; wait for it instead of calling the LLM
+                    try:
+                        answer = flight.result(timeout=self.llm_timeout)
+                    except FutureTimeoutError:
+                        raise TimeoutError(f"Timed out after {self.llm_timeout}s waiting for an identical request")
+                    yield "token", {"text": answer}
+                else:
+                    try:
+                        # Same prompt the stuff chain would build, but sent through llm.stream
+                        from langchain_core.prompts import format_document
+                        context_documents = self.assemble_context(source_documents, prompt_method)
+                        context = combine_chain.document_separator.join(
+                            format_document(doc, combine_chain.document_prompt) for doc in context_documents
+                        )
+                        prompt_text = combine_chain.llm_chain.prompt.format(context=context, question=question)
+                        tokens = []
+                        started = time.perf_counter()
+                        for chunk in self.llm.stream(prompt_text):
+                            if chunk.content:
+                                if not tokens:
+                                    metrics.observe("llm_first_token", time.perf_counter() - started)
+                                tokens.append(chunk.content)
+                                yield "token", {"text": chunk.content}
+                        # Includes time the client took to consume tokens
+                        metrics.observe("llm_stream", time.perf_counter() - started)
+                        answer = "".join(tokens)
+                    except BaseException as e:
+                        # e.g. GeneratorExit when the client disconnects; waiters get an ordinary error
+                        error = e if isinstance(e, Exception) else RuntimeError("Streaming request was abandoned")
+                        self._in_flight.finish(flight_key, flight, error=error)
+                        raise
+                    self._in_flight.finish(flight_key, flight, answer)
+                    self._record_llm_tokens(context_documents, answer)
+                    self.answer_cache.put(prompt_method, source_documents, question, answer)
+            yield "done", {"method": method_name, "cached": cached}
         except Exception as e:
-            logging.error(f"Error querying with method {method_name}: {str(e)}")
-            return {"error": str(e)} 
\ No newline at end of file
+            logging.error(f"Error streaming with method {method_name}: {str(e)}")
+            yield "error", {"error": str(e)}
@@ -0,0 +1,93 @@
+import time
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks with a cross-encoder, within a latency budget.
+
+    Question/chunk pairs are scored in batches, best bi-encoder ranks first
+    across all questions, so when the budget runs out every question has had
+    its most promising candidates scored. Unscored candidates keep their
+    bi-encoder order behind the scored ones.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 16, max_length: int = 256,
+                 model=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = model  # anything with CrossEncoder's predict(pairs, batch_size=...)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.pairs_scored = 0
+        self.pairs_skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def warm_up(self) -> None:
+        self.model.predict([("warm up", "warm up")], batch_size=1)
+
+    def rerank_batch(self, questions: List[str], candidates: List[List[Document]], top_n: int,
+                     budget_seconds: Optional[float] = None, min_score: Optional[float] = None) -> List[List[Document]]:
+        """Best top_n of each question's candidates by cross-encoder score.
+
+        budget_seconds is per question; scoring stops at the first batch
+        boundary past the total. Chunks scoring below min_score are dropped,
+        but each question keeps at least its best chunk.
+        """
+        start = time.perf_counter()
+        # Rank-major order: every question's rank-0 candidate, then every rank-1, ...
+        order = sorted(
+            ((rank, i) for i, docs in enumerate(candidates) for rank in range(len(docs))),
+            key=lambda pair: pair[0]
+        )
+        scores = [np.full(len(docs), np.nan, dtype=np.float32) for docs in candidates]
+        deadline = start + budget_seconds * len(questions) if budget_seconds is not None else None
+        scored = 0
+        for batch_start in range(0, len(order), self.batch_size):
+            if deadline is not None and batch_start and time.perf_counter() > deadline:
+                break
+            batch = order[batch_start:batch_start + self.batch_size]
+            pairs = [(questions[i], candidates[i][rank].page_content) for rank, i in batch]
+            batch_scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size), dtype=np.float32)
+            for (rank, i), score in zip(batch, batch_scores):
+                scores[i][rank] = score
+            scored += len(batch)
+
+        results = []
+        for docs, doc_scores in zip(candidates, scores):
+            is_scored = ~np.isnan(doc_scores)
+            # Scored chunks by descending score, then unscored ones in their original order
+            ranking = sorted(range(len(docs)), key=lambda r: (not is_scored[r], -doc_scores[r] if is_scored[r] else r))
+            if min_score is not None:
+                kept = [r for r in ranking if not is_scored[r] or doc_scores[r] >= min_score]
+                ranking = kept or ranking[:1]
+            results.append([docs[r] for r in ranking[:top_n]])
+        with self._lock:
+            self.calls += 1
+            self.pairs_scored += scored
+            self.pairs_skipped += len(order) - scored
+            self.seconds += time.perf_counter() - start
+        return results
+
+    def get_stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "pairs_scored": self.pairs_scored,
+            "pairs_skipped": self.pairs_skipped,
+            "avg_ms": 1000 * self.seconds / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is still running wait for it and get the same result (or exception).
+    Nothing is kept once the call finishes, so completed results are left to
+    the answer cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> concurrent.futures.Future
+        self._tasks = {}  # (event loop, key) -> asyncio.Task
+        self.executed = 0
+        self.coalesced = 0
+
+    def begin(self, key: Hashable):
+        """(is_leader, future): the leader must call finish(); followers wait on future.result()"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.executed += 1
+                return True, future
+            self.coalesced += 1
+            return False, future
+
+    def finish(self, key: Hashable, future: Future, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        leader, future = self.begin(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    async def ado(self, key: Hashable, coroutine_fn: Callable, *args, **kwargs) -> Any:
+        """Async variant; calls are shared among callers on the same event loop"""
+        task_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = asyncio.ensure_future(coroutine_fn(*args, **kwargs))
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        # One caller giving up (e.g. its deadline passing) must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls) + len(self._tasks)}
@@ -0,0 +1,90 @@
+"""ASGI entry point.
+
+/query and /compare_methods are served natively async, so one worker keeps
+many LLM calls in flight; every other route is handed to the Flask app.
+
+    uvicorn --factory routes.asgi:create_app
+"""
+import json
+from flask import Flask
+from asgiref.wsgi import WsgiToAsgi
+from routes import main_bp, rag_bp, rag_routes
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+async def _send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + [(name.encode(), value.encode()) for name, value in headers]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def query(data):
+    question = data.get('question')
+    method = data.get('method')
+    if not question or not method:
+        return {"error": "Missing question or method"}, 400
+    try:
+        timeout = rag_routes.request_timeout(data.get('timeout'), rag_routes.rag_system.llm_timeout)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    result = await rag_routes.rag_system.aquery_with_method(
+        question, method, data.get('prompt_method'), data.get('custom_prompt'), timeout=timeout
+    )
+    return result, 200
+
+async def compare_methods(data):
+    question = data.get('question')
+    if not question:
+        return {"error": "Missing question"}, 400
+    try:
+        timeout = rag_routes.request_timeout(data.get('timeout'), rag_routes.rag_system.compare_timeout)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    results = await rag_routes.rag_system.acompare_methods(
+        question, data.get('prompt_method'), data.get('custom_prompt'), timeout=timeout
+    )
+    return results, 200
+
+ASYNC_ROUTES = {
+    ("POST", "/query"): query,
+    ("POST", "/compare_methods"): compare_methods,
+}
+
+def create_app(flask_app=None):
+    """Wrap flask_app (by default a new app with both blueprints) with the async query routes"""
+    if flask_app is None:
+        flask_app = Flask(__name__)
+        flask_app.register_blueprint(main_bp)
+        flask_app.register_blueprint(rag_bp)
+    wsgi_app = WsgiToAsgi(flask_app)
+
+    async def app(scope, receive, send):
+        handler = None
+        if scope["type"] == "http":
+            handler = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+        if handler is None:
+            return await wsgi_app(scope, receive, send)
+        if not rag_routes.rag_system:
+            return await _send_json(
+                send, rag_routes.warming_up_status(), 503,
+                headers=[("retry-after", str(rag_routes.retry_after_seconds()))]
+            )
+        try:
+            data = await _read_json(receive)
+        except ValueError:
+            return await _send_json(send, {"error": "Invalid JSON body"}, 400)
+        payload, status = await handler(data)
+        await _send_json(send, payload, status)
+
+    return app
@@ -1,16 +1,129 @@
-from flask import Blueprint, request, jsonify
+import os
+import json
+import math
+import time
+import logging
+import threading
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from rag.rag_system import RAGSystem
 from rag.PromptGenerator import PROMPTING_METHODS
+from rag.metrics import metrics
 
 bp = Blueprint('rag', __name__)
-rag_system = RAGSystem()  # Initialize at import time
+rag_system = None  # set once the background build has finished
 
-# Removed /initialize endpoint
+# Build progress, reported by /ready
+_startup = {"phase": "idle", "error": None, "started_at": None, "ready_at": None, "pid": None,
+            "attempts": 0, "failed_at": None}
+_startup_lock = threading.Lock()
+RETRY_AFTER_SECONDS = int(os.getenv("RAG_RETRY_AFTER", "5"))
+MAX_BUILD_RETRY_SECONDS = int(os.getenv("RAG_MAX_BUILD_RETRY", "300"))
+
+def _build_rag_system():
+    global rag_system
+    try:
+        _startup["phase"] = "building_indexes"
+        system = RAGSystem()
+        _startup["phase"] = "warming_chains"
+        system.warm_up()
+        rag_system = system
+        _startup["ready_at"] = time.time()
+        _startup["error"] = None
+        _startup["phase"] = "ready"
+    except Exception as e:
+        logging.error(f"RAG system failed to start: {str(e)}")
+        _startup["error"] = str(e)
+        _startup["attempts"] += 1
+        _startup["failed_at"] = time.time()
+        _startup["phase"] = "failed"
+
+def _build_retry_delay():
+    """Seconds between the last failed build and the next attempt, doubling per failure"""
+    return min(RETRY_AFTER_SECONDS * 2 ** max(_startup["attempts"] - 1, 0), MAX_BUILD_RETRY_SECONDS)
+
+def retry_after_seconds():
+    """Retry-After for a request answered before the system is ready"""
+    if _startup["phase"] == "failed":
+        return max(int(_startup["failed_at"] + _build_retry_delay() - time.time()), 1)
+    return RETRY_AFTER_SECONDS
+
+def start_rag_system(background=True):
+    """Kick off the build; a no-op while it runs or once it has succeeded.
+
+    A failed build is retried after a backoff. A worker forked (e.g. gunicorn
+    --preload) while its parent was still building starts its own build, since
+    the parent's build thread does not exist in the child.
+    """
+    with _startup_lock:
+        phase = _startup["phase"]
+        orphaned = phase not in ("idle", "ready", "failed") and _startup["pid"] != os.getpid()
+        retry = phase == "failed" and time.time() >= _startup["failed_at"] + _build_retry_delay()
+        if phase != "idle" and not orphaned and not retry:
+            return
+        _startup["phase"] = "starting"
+        _startup["started_at"] = time.time()
+        _startup["pid"] = os.getpid()
+    if background:
+        threading.Thread(target=_build_rag_system, name="rag-warm-up", daemon=True).start()
+    else:
+        _build_rag_system()
+
+@bp.record_once
+def _on_register(state):
+    # Lazy mode (default) lets the server bind and answer health checks while indexes build
+    lazy = os.getenv("RAG_LAZY_INIT", "1").lower() not in ("0", "false", "no")
+    start_rag_system(background=lazy)
+
+def warming_up_status():
+    """503 body for requests that arrive before the system is ready; also starts (or retries) the build"""
+    start_rag_system()
+    status = {"error": "RAG system not initialized", "phase": _startup["phase"]}
+    if _startup["error"]:
+        status["detail"] = _startup["error"]
+        status["attempts"] = _startup["attempts"]
+    return status
+
+def request_timeout(value, limit):
+    """Per-request timeout in seconds: None when not given, capped at limit.
+
+    Raises ValueError for anything that is not a positive number.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("timeout must be a positive number of seconds")
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("timeout must be a positive number of seconds")
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise ValueError("timeout must be a positive number of seconds")
+    return min(timeout, limit)
+
+def _warming_up_response():
+    response = jsonify(warming_up_status())
+    response.headers["Retry-After"] = str(retry_after_seconds())
+    return response, 503
+
+@bp.route('/ready', methods=['GET'])
+def ready():
+    if not rag_system:
+        return _warming_up_response()
+    return jsonify({
+        "phase": _startup["phase"],
+        "startup_seconds": round(_startup["ready_at"] - _startup["started_at"], 3)
+    })
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text format: per-stage latency histograms, counters and cache gauges"""
+    gauges = rag_system.metrics_gauges() if rag_system else {}
+    return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
 
 @bp.route('/analyze_chunking', methods=['GET'])
 def analyze_chunking():
     if not rag_system:
-        return jsonify({"error": "RAG system not initialized"}), 400
+        return _warming_up_response()
     analysis = rag_system.get_chunking_analysis()
     return jsonify(analysis)
 
@@ -21,7 +134,7 @@ def prompting_methods():
 @bp.route('/query', methods=['POST'])
 def query():
     if not rag_system:
-        return jsonify({"error": "RAG system not initialized"}), 400
+        return _warming_up_response()
     data = request.get_json()
     question = data.get('question')
     method = data.get('method')
@@ -32,17 +145,41 @@ def query():
     result = rag_system.query_with_method(question, method, prompt_method, custom_prompt)
     return jsonify(result)
 
+@bp.route('/query/stream', methods=['POST'])
+def query_stream():
+    """Server-sent events: sources as soon as retrieval finishes, then LLM tokens"""
+    if not rag_system:
+        return _warming_up_response()
+    data = request.get_json()
+    question = data.get('question')
+    method = data.get('method')
+    prompt_method = data.get('prompt_method')
+    if not question or not method:
+        return jsonify({"error": "Missing question or method"}), 400
+
+    def generate():
+        for event, payload in rag_system.stream_query(question, method, prompt_method):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @bp.route('/compare_methods', methods=['POST'])
 def compare_methods():
     if not rag_system:
-        return jsonify({"error": "RAG system not initialized"}), 400
+        return _warming_up_response()
     data = request.get_json()
     question = data.get('question')
     prompt_method = data.get('prompt_method')
     custom_prompt = data.get('custom_prompt')
     if not question:
         return jsonify({"error": "Missing question"}), 400
-    results = {}
-    for method in rag_system.qa_chains.keys():
-        results[method] = rag_system.query_with_method(question, method, prompt_method, custom_prompt)
+    try:
+        timeout = request_timeout(data.get('timeout'), rag_system.compare_timeout)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    results = rag_system.compare_methods(question, prompt_method, custom_prompt, timeout=timeout)
     return jsonify(results) 
\ No newline at end of file
@@ -0,0 +1,43 @@
+import faiss
+import numpy as np
+
+from rag.ann_index import AnnIndex
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def nlist(ann):
+    return faiss.extract_index_ivf(ann.index).nlist
+
+
+def test_ivf_centroids_are_reused_while_the_corpus_size_is_similar():
+    ann = AnnIndex("ivf")
+    ann.build(vectors(1000))
+    trained = ann.trained
+    ann.build(vectors(3000))
+    assert ann.trained is trained and ann.trained_at == 1000
+
+
+def test_ivf_retrains_when_the_corpus_grows_well_past_its_training_size():
+    ann = AnnIndex("ivf")
+    ann.build(vectors(1000))
+    small_nlist = nlist(ann)
+    ann.build(vectors(20000))
+    assert ann.trained_at == 20000
+    assert nlist(ann) > small_nlist
+
+
+def test_ivfpq_falls_back_to_ivf_until_there_is_enough_data(tmp_path):
+    params = {"pq_bits": 4}  # PQ training needs 39 * 2**4 = 624 vectors
+    ann = AnnIndex("ivfpq", params)
+    ann.build(vectors(300, dim=32), "small")
+    assert ann.index_type == "ivf"
+    ann.save(str(tmp_path))
+
+    loaded = AnnIndex.load(str(tmp_path), "ivfpq", params)
+    assert (loaded.index_type, loaded.trained_at) == ("ivf", 300)
+    loaded.build(vectors(2000, dim=32), "large")
+    assert loaded.index_type == "ivfpq"
+    assert isinstance(faiss.downcast_index(loaded.index), faiss.IndexIVFPQ)
@@ -0,0 +1,108 @@
+import types
+
+import pytest
+from langchain_core.documents import Document
+
+from rag import answer_cache
+from rag.answer_cache import AnswerCache, InMemoryAnswerBackend, SQLiteAnswerBackend
+
+DOCS = [Document(page_content="Qubits hold superpositions.", metadata={"chunk_id": "q1"})]
+OTHER_DOCS = [Document(page_content="Classical bits are 0 or 1.", metadata={"chunk_id": "b1"})]
+
+
+class TableEmbeddings:
+    """Fixed vectors per question, so similarities are chosen by the test"""
+
+    VECTORS = {
+        "What is a qubit?": [1.0, 0.0, 0.0],
+        "Explain what a qubit is": [0.99, 0.14, 0.0],
+        "Who invented the transistor?": [0.0, 0.0, 1.0],
+    }
+
+    def embed_query(self, text):
+        return self.VECTORS[text]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.time() inside rag.answer_cache with a clock the test advances"""
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(answer_cache, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return InMemoryAnswerBackend(**kwargs)
+        return SQLiteAnswerBackend(str(tmp_path / "answers.sqlite"), **kwargs)
+    return make
+
+
+def test_exact_hit_needs_the_same_question_context_and_prompt_method(make_backend):
+    cache = AnswerCache(make_backend(), mode="exact")
+    cache.put("zero_shot", DOCS, "What is a qubit?", "A quantum bit.")
+    # Case, spacing and trailing punctuation are normalized away
+    assert cache.get("zero_shot", DOCS, "  what is a   QUBIT ") == "A quantum bit."
+    assert cache.get("zero_shot", OTHER_DOCS, "What is a qubit?") is None
+    assert cache.get("few_shot", DOCS, "What is a qubit?") is None
+    assert cache.get("zero_shot", DOCS, "Explain what a qubit is") is None
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 3
+
+
+def test_semantic_hit_accepts_a_close_paraphrase_only(make_backend):
+    cache = AnswerCache(make_backend(), mode="semantic", embeddings=TableEmbeddings(), similarity_threshold=0.95)
+    cache.put("zero_shot", DOCS, "What is a qubit?", "A quantum bit.")
+    assert cache.get("zero_shot", DOCS, "Explain what a qubit is") == "A quantum bit."
+    assert cache.get("zero_shot", DOCS, "Who invented the transistor?") is None
+    # A paraphrase still needs the same retrieved context
+    assert cache.get("zero_shot", OTHER_DOCS, "Explain what a qubit is") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_semantic_mode_needs_embeddings():
+    with pytest.raises(ValueError):
+        AnswerCache(mode="semantic")
+
+
+def test_generation_config_scopes_a_shared_backend(make_backend):
+    backend = make_backend()
+    groq = AnswerCache(backend, generation_config={"backend": "groq", "model": "a"})
+    groq.put("zero_shot", DOCS, "What is a qubit?", "A quantum bit.")
+    other_model = AnswerCache(backend, generation_config={"backend": "groq", "model": "b"})
+    assert other_model.get("zero_shot", DOCS, "What is a qubit?") is None
+    same_config = AnswerCache(backend, generation_config={"model": "a", "backend": "groq"})
+    assert same_config.get("zero_shot", DOCS, "What is a qubit?") == "A quantum bit."
+
+
+def test_entries_expire_after_ttl(make_backend, clock):
+    cache = AnswerCache(make_backend(ttl=60), mode="semantic", embeddings=TableEmbeddings())
+    cache.put("zero_shot", DOCS, "What is a qubit?", "A quantum bit.")
+    clock.value += 59
+    assert cache.get("zero_shot", DOCS, "What is a qubit?") == "A quantum bit."
+    clock.value += 2
+    assert cache.get("zero_shot", DOCS, "What is a qubit?") is None
+    assert cache.get("zero_shot", DOCS, "Explain what a qubit is") is None
+
+
+def test_least_recently_used_entry_is_evicted(make_backend, clock):
+    cache = AnswerCache(make_backend(max_entries=2), mode="exact")
+    for question in ("first", "second"):
+        cache.put("zero_shot", DOCS, question, question.upper())
+        clock.value += 1
+    assert cache.get("zero_shot", DOCS, "first") == "FIRST"  # now more recent than "second"
+    clock.value += 1
+    cache.put("zero_shot", DOCS, "third", "THIRD")
+    assert cache.get("zero_shot", DOCS, "second") is None
+    assert cache.get("zero_shot", DOCS, "first") == "FIRST"
+    assert cache.get("zero_shot", DOCS, "third") == "THIRD"
+
+
+def test_off_mode_stores_nothing():
+    backend = InMemoryAnswerBackend()
+    cache = AnswerCache(backend, mode="off")
+    cache.put("zero_shot", DOCS, "What is a qubit?", "A quantum bit.")
+    assert cache.get("zero_shot", DOCS, "What is a qubit?") is None
+    assert backend.scan(cache._scope("zero_shot", DOCS)) == []
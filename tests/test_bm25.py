@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = {
+    "qubits": "Quantum computers use qubits. Qubits can exist in superposition.",
+    "classical": "Classical computers use bits that are either 0 or 1.",
+    "ml": "Machine learning models learn patterns from data.",
+    "mixed": "Quantum machine learning combines qubits with learning algorithms.",
+}
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(list(TEXTS), list(TEXTS.values()))
+
+
+def test_tokenize_lowercases_and_drops_punctuation():
+    assert tokenize("Qubits, qubits; QUBITS!") == ["qubits", "qubits", "qubits"]
+
+
+def test_search_ranks_by_term_weight(index):
+    results = index.search("qubits", k=10)
+    assert [doc_id for doc_id, _ in results] == ["qubits", "mixed"]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+
+
+def test_rare_terms_outweigh_common_ones(index):
+    # "computers" is in two chunks, "superposition" in one
+    (best, _), = index.search("superposition", k=1)
+    assert best == "qubits"
+    assert index.search("computers superposition", k=1)[0][0] == "qubits"
+
+
+def test_search_leaves_out_chunks_without_query_terms(index):
+    assert index.search("unrelated words", k=5) == []
+    assert len(index.search("learning quantum computers", k=2)) == 2
+
+
+def test_empty_index():
+    empty = BM25Index.build([], [])
+    assert empty.search("anything", k=3) == []
+
+
+def test_saved_index_is_memory_mapped_and_ranks_identically(tmp_path, index):
+    index.save(str(tmp_path), "stamp")
+    loaded = BM25Index.load(str(tmp_path), "stamp")
+    assert isinstance(loaded.weights, np.memmap)
+    for query in ("qubits", "machine learning", "classical bits 0", "nothing here"):
+        assert loaded.search(query, k=3) == index.search(query, k=3)
+    assert BM25Index.load(str(tmp_path), "other stamp") is None
+    assert BM25Index.load(str(tmp_path / "missing"), "stamp") is None
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = ["a", "b", "c"]
+    sparse = ["c", "b", "d"]
+    fused = reciprocal_rank_fusion([dense, sparse])
+    # Chunks found by both rankings beat a and d, which only one ranking found
+    assert fused == ["c", "b", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_single_ranking_keeps_order():
+    assert reciprocal_rank_fusion([["x", "y", "z"]]) == ["x", "y", "z"]
+    assert reciprocal_rank_fusion([]) == []
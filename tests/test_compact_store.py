@@ -0,0 +1,113 @@
+import os
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from rag.compact_store import CompactDocstore, CompactStore, compact_file_name
+
+N, DIM, K = 2000, 64, 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((N, DIM)).astype(np.float32)
+    queries = rng.standard_normal((50, DIM)).astype(np.float32)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    ids = [f"chunk-{i}" for i in range(N)]
+    documents = [
+        Document(page_content=f"text {i} é中", metadata={"source": f"doc{i % 7}.txt", "chunk_id": ids[i]})
+        for i in range(N)
+    ]
+    return index, queries, ids, documents
+
+
+def write_store(directory, corpus, dtype):
+    index, _, ids, documents = corpus
+    path = os.path.join(directory, compact_file_name(dtype))
+    CompactStore.write(path, index, ids, documents, dtype, stamp="stamp")
+    return CompactStore.open(path)
+
+
+@pytest.mark.parametrize("dtype,min_recall", [("fp16", 0.99), ("int8", 0.9)])
+def test_search_matches_exact_float32(tmp_path, corpus, dtype, min_recall):
+    index, queries, _, _ = corpus
+    store = write_store(str(tmp_path), corpus, dtype)
+    exact_distances, exact_positions = index.search(queries, K)
+    distances, positions = store.search(queries, K)
+
+    assert positions.shape == distances.shape == (len(queries), K)
+    recall = np.mean([len(set(p) & set(e)) / K for p, e in zip(positions, exact_positions)])
+    assert recall >= min_recall
+    # Sorted nearest first, and close to the float32 distances of the same rows
+    assert np.all(np.diff(distances, axis=1) >= 0)
+    assert np.allclose(distances[:, 0], exact_distances[:, 0], rtol=0.05)
+
+
+def test_search_caps_k_at_corpus_size(tmp_path, corpus):
+    index, queries, ids, documents = corpus
+    path = str(tmp_path / "small.bin")
+    small = faiss.IndexFlatL2(DIM)
+    small.add(index.reconstruct_n(0, 3))
+    CompactStore.write(path, small, ids[:3], documents[:3], "fp16", stamp="stamp")
+    distances, positions = CompactStore.open(path).search(queries[:2], K)
+    assert positions.shape == (2, 3)
+    assert sorted(positions[0]) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("dtype", ["fp16", "int8"])
+def test_round_trips_ids_texts_and_metadata(tmp_path, corpus, dtype):
+    _, _, ids, documents = corpus
+    store = write_store(str(tmp_path), corpus, dtype)
+    assert (store.n, store.dim, store.dtype, store.stamp) == (N, DIM, dtype, "stamp")
+    assert store.ids() == ids
+    for i in (0, 1, N // 2, N - 1):
+        assert store.chunk_id(i) == ids[i]
+        assert store.document(i) == documents[i]
+
+
+def test_open_rejects_missing_and_foreign_files(tmp_path):
+    assert CompactStore.open(str(tmp_path / "missing.bin")) is None
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"not a compact store")
+    assert CompactStore.open(str(other)) is None
+
+
+def test_is_current_until_the_file_is_replaced(tmp_path, corpus):
+    store = write_store(str(tmp_path), corpus, "fp16")
+    assert store.is_current()
+    write_store(str(tmp_path), corpus, "fp16")
+    assert not store.is_current()
+
+
+def test_docstore_overlay_add_delete_and_pickle(tmp_path, corpus):
+    _, _, ids, documents = corpus
+    docstore = CompactDocstore(write_store(str(tmp_path), corpus, "int8"))
+    assert docstore.pristine
+    assert docstore.search(ids[5]) == documents[5]
+
+    added = Document(page_content="new chunk", metadata={"source": "new.txt"})
+    docstore.add({"new": added})
+    docstore.delete([ids[5], ids[6]])
+    assert not docstore.pristine
+    assert docstore.search("new") == added
+    assert docstore.search(ids[5]) == f"ID {ids[5]} not found."
+
+    with pytest.raises(ValueError):
+        docstore.add({ids[7]: added})
+    with pytest.raises(ValueError):
+        docstore.delete([ids[5]])
+    docstore.add({ids[5]: documents[5]})  # a deleted id may be added back
+    assert docstore.search(ids[5]) == documents[5]
+
+    restored = pickle.loads(pickle.dumps(docstore))
+    assert type(restored) is InMemoryDocstore
+    assert restored.search("new") == added
+    assert restored.search(ids[5]) == documents[5]
+    assert restored.search(ids[6]) == f"ID {ids[6]} not found."
+    assert len(restored._dict) == N
@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+
+from rag.context_assembly import (
+    assemble_context, count_context_tokens, drop_near_duplicates, merge_overlapping, trim_to_budget
+)
+
+TEXT = ("Quantum computers use qubits that can exist in superposition. "
+        "Entanglement links qubits so that measuring one affects the other. "
+        "Shor's algorithm factors large numbers and threatens RSA encryption.")
+
+
+def doc(text, source="quantum.txt", **metadata):
+    return Document(page_content=text, metadata={"source": source, **metadata})
+
+
+def test_overlapping_chunks_from_one_source_are_joined():
+    # As a splitter with overlap would produce them; the lower-ranked chunk comes first in the text
+    first, second = doc(TEXT[:90], rank=2), doc(TEXT[60:], rank=1)
+    merged = merge_overlapping([second, first])
+    assert [chunk.page_content for chunk in merged] == [TEXT]
+    assert merged[0].metadata["rank"] == 1  # keeps the better-ranked chunk's metadata
+
+
+def test_overlap_is_not_merged_across_sources_or_below_min_overlap():
+    first, second = doc(TEXT[:90]), doc(TEXT[60:], source="other.txt")
+    assert merge_overlapping([first, second]) == [first, second]
+    short = doc(TEXT[85:])  # shares only 5 characters with first
+    assert merge_overlapping([first, short], min_overlap=20) == [first, short]
+
+
+def test_near_duplicates_keep_the_better_ranked_chunk():
+    best = doc(TEXT, rank=1)
+    copy = doc(TEXT.replace("Quantum", "quantum"), source="mirror.txt", rank=2)
+    unrelated = doc("Classical bits are either zero or one.", rank=3)
+    assert drop_near_duplicates([best, copy, unrelated]) == [best, unrelated]
+
+
+def test_budget_keeps_whole_chunks_in_rank_order_and_cuts_the_last():
+    chunks = [doc("one two three four"), doc("five six seven eight"), doc("nine ten")]
+    trimmed = trim_to_budget(chunks, 6)
+    assert [chunk.page_content for chunk in trimmed] == ["one two three four", "five six"]
+    assert count_context_tokens(trimmed) == 6
+    assert trim_to_budget(chunks, 4) == chunks[:1]
+    assert trim_to_budget(chunks, 100) == chunks
+
+
+def test_assemble_context_merges_before_deduplicating_and_trimming():
+    chunks = [
+        doc(TEXT[60:]), doc(TEXT[:90]), doc(TEXT, source="mirror.txt"), doc("Bits are zero or one.", "bits.txt")
+    ]
+    assembled = assemble_context(chunks)
+    assert [chunk.page_content for chunk in assembled] == [TEXT, "Bits are zero or one."]
+    budgeted = assemble_context(chunks, max_tokens=10)
+    assert len(budgeted) == 1 and count_context_tokens(budgeted) == 10
+    assert TEXT.startswith(budgeted[0].page_content)
@@ -0,0 +1,105 @@
+import pytest
+from langchain_text_splitters import CharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.ingestion import IngestionPipeline
+
+
+@pytest.fixture
+def pipeline():
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=40, chunk_overlap=0)
+    return IngestionPipeline({"lines": splitter}, DeterministicFakeEmbedding(size=16))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "qubits.txt").write_text("Qubits hold superpositions.\nEntanglement links qubits.")
+    (tmp_path / "bits.txt").write_text("Classical bits are 0 or 1.")
+    return tmp_path
+
+
+def contents(vector_store):
+    assert vector_store.index.ntotal == len(vector_store.index_to_docstore_id)
+    return sorted(vector_store.docstore.search(i).page_content for i in vector_store.index_to_docstore_id.values())
+
+
+def test_first_ingest_adds_every_file_and_a_rerun_embeds_nothing(pipeline, corpus):
+    stores, manifests = {}, {}
+    summary = pipeline.ingest([str(corpus)], stores, manifests)
+    assert (summary["added"], summary["chunks_embedded"]) == (2, 3)
+    assert contents(stores["lines"]) == [
+        "Classical bits are 0 or 1.", "Entanglement links qubits.", "Qubits hold superpositions."
+    ]
+    assert set(manifests["lines"]["documents"]) == {str(corpus / "qubits.txt"), str(corpus / "bits.txt")}
+
+    rerun = pipeline.ingest([str(corpus)], stores, manifests)
+    assert (rerun["unchanged"], rerun["chunks_embedded"]) == (2, 0)
+
+
+def test_changed_file_replaces_its_old_chunks(pipeline, corpus):
+    stores, manifests = {}, {}
+    pipeline.ingest([str(corpus)], stores, manifests)
+    (corpus / "bits.txt").write_text("Bits are stored in transistors.")
+    summary = pipeline.ingest([str(corpus)], stores, manifests)
+    assert (summary["updated"], summary["unchanged"], summary["chunks_embedded"]) == (1, 1, 1)
+    assert "Classical bits are 0 or 1." not in contents(stores["lines"])
+    assert "Bits are stored in transistors." in contents(stores["lines"])
+
+
+def test_deleted_file_is_removed_even_from_a_partial_ingest(pipeline, corpus):
+    stores, manifests = {}, {}
+    pipeline.ingest([str(corpus)], stores, manifests)
+    bits = corpus / "bits.txt"
+    bits.unlink()
+    # Listed explicitly but gone: a removal, not a failure
+    summary = pipeline.ingest([str(bits)], stores, manifests, remove_missing=False)
+    assert (summary["removed"], summary["failed"]) == (1, 0)
+    assert contents(stores["lines"]) == ["Entanglement links qubits.", "Qubits hold superpositions."]
+    assert list(manifests["lines"]["documents"]) == [str(corpus / "qubits.txt")]
+
+
+def test_partial_ingest_keeps_files_it_was_not_given(pipeline, corpus):
+    stores, manifests = {}, {}
+    pipeline.ingest([str(corpus / "qubits.txt")], stores, manifests)
+    summary = pipeline.ingest([str(corpus / "bits.txt")], stores, manifests, remove_missing=False)
+    assert (summary["added"], summary["removed"]) == (1, 0)
+    assert len(contents(stores["lines"])) == 3
+    # A full sync over the same file list drops the one that was not listed
+    summary = pipeline.ingest([str(corpus / "bits.txt")], stores, manifests)
+    assert summary["removed"] == 1
+    assert contents(stores["lines"]) == ["Classical bits are 0 or 1."]
+
+
+def test_stores_passed_in_are_not_modified(pipeline, corpus):
+    stores, manifests = {}, {}
+    pipeline.ingest([str(corpus)], stores, manifests)
+    original = stores["lines"]
+    before = contents(original)
+    (corpus / "bits.txt").write_text("Bits are stored in transistors.")
+    pipeline.ingest([str(corpus)], stores, manifests)
+    assert stores["lines"] is not original
+    assert contents(original) == before
+
+
+def test_manifest_is_only_written_once_the_chunks_are_added(pipeline, corpus, monkeypatch):
+    stores, manifests = {}, {}
+    pipeline.ingest([str(corpus)], stores, manifests)
+    bits = str(corpus / "bits.txt")
+    (corpus / "bits.txt").write_text("Bits are stored in transistors.")
+
+    def fail(self, documents, **kwargs):
+        raise RuntimeError("embedding service unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(FAISS, "add_documents", fail)
+        with pytest.raises(RuntimeError):
+            pipeline.ingest([str(corpus)], stores, manifests)
+    # The old chunks are gone, so the file must not look indexed
+    assert bits not in manifests["lines"]["documents"]
+
+    summary = pipeline.ingest([str(corpus)], stores, manifests)
+    assert (summary["added"], summary["unchanged"]) == (1, 1)
+    assert contents(stores["lines"]) == [
+        "Bits are stored in transistors.", "Entanglement links qubits.", "Qubits hold superpositions."
+    ]
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rag.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_one_key_run_once():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow, 21))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Let the followers reach the in-flight future before the leader finishes
+    deadline = time.monotonic() + 5
+    while flight.coalesced < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * 8
+    assert flight.get_stats() == {"executed": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight()
+    leader, future = flight.begin("key")
+    follower, same_future = flight.begin("key")
+    assert leader and not follower and same_future is future
+
+    flight.finish("key", future, error=ValueError("boom"))
+    with pytest.raises(ValueError):
+        same_future.result(timeout=1)
+    # Once finished, the next call runs again instead of reusing the failure
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.get_stats()["coalesced"] == 0
+
+
+def test_async_calls_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def answer(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", answer, "x") for _ in range(5)))
+
+    assert asyncio.run(main()) == ["x"] * 5
+    assert calls == ["x"]
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_async_caller_timing_out_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def answer():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        impatient = asyncio.wait_for(flight.ado("key", answer), 0.01)
+        patient = flight.ado("key", answer)
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    impatient, patient = asyncio.run(main())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "done"